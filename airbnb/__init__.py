@@ -0,0 +1,3 @@
+"""
+Helpers shared by the Streamlit app (app_airbnb.py), the notebooks and the benchmarks.
+"""
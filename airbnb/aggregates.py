@@ -0,0 +1,56 @@
+"""
+Aggregate layer used by the charts of the app.
+
+Instead of scanning the listings on every rerun, we compute once per dataset version a small
+cube of counts and sums at the finest grain (neighbourhood x property type x room type x accommodates).
+Counts, sums and means for any combination of those dimensions are rolled up from the cube;
+quantiles are not additive, so they are precomputed for each dimension.
+The app does not chart the quantiles: they are kept for the analyses that use this module outside the app.
+"""
+DIMENSIONS = ['neighbourhood_cleansed', 'property_type', 'room_type', 'accommodates']
+MEASURES = ['price', 'review_scores_rating', 'review_scores_location']
+QUANTILES = [0.25, 0.5, 0.75]
+# columns that build_aggregates() needs from the listings
+COLUMNS = DIMENSIONS + MEASURES + ['host_is_superhost']
+
+
+def build_aggregates(df):
+    """
+    Compute the aggregate layer from the listings. Returns a dict with:
+
+    - ``cube``: count, ``<measure>_sum`` and ``<measure>_n`` (non-null values) indexed by DIMENSIONS
+    - ``quantiles``: {dimension: price quantiles per value of that dimension} (not used by the app)
+    - ``by_score``: mean price for each general score
+    - ``superhost``: number of listings by host_is_superhost
+    - ``mean_price``: mean price of all the listings
+    """
+    df = df[COLUMNS].astype({m: 'float64' for m in MEASURES})
+    grouped = df.groupby(DIMENSIONS, observed=True)
+
+    cube = grouped.size().to_frame('count')
+    for m in MEASURES:
+        cube[f'{m}_sum'] = grouped[m].sum()
+        cube[f'{m}_n'] = grouped[m].count()
+
+    quantiles = {dim: df.groupby(dim, observed=True)['price'].quantile(QUANTILES).unstack() for dim in DIMENSIONS}
+
+    return {
+        'cube': cube,
+        'quantiles': quantiles,
+        # the scores are float32 in the store: round away the float32 noise before using them as keys
+        'by_score': df.groupby(df['review_scores_rating'].round(6))['price'].mean().sort_values().reset_index(),
+        'superhost': df['host_is_superhost'].value_counts(),
+        'mean_price': df['price'].mean(),
+    }
+
+
+def rollup(aggs, by):
+    """
+    Roll the cube up to the dimension(s) ``by``.
+    Returns a dataframe with the ``count``, the ``<measure>_sum`` columns and the mean of each measure (named as the measure).
+    """
+    cube = aggs['cube']
+    table = cube.groupby(level=by, observed=True).sum()
+    for m in MEASURES:
+        table[m] = table[f'{m}_sum'] / table[f'{m}_n']
+    return table.drop(columns=[f'{m}_n' for m in MEASURES])
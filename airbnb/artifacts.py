@@ -0,0 +1,98 @@
+"""
+In-memory cache for the prebuilt render artifacts (folium maps and plotly figures exported to html/).
+
+Each file is read once per process and kept in memory until it changes on disk
+(checked with its mtime and size; the content hash identifies the version that is served).
+The cache is bounded in bytes and evicts the least recently used files first.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 32 * 1024 * 1024
+
+
+def minify_html(text):
+    """
+    Cheap, safe minification: strip the indentation and drop the empty lines.
+    """
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+class ArtifactCache:
+    """
+    Thread-safe LRU cache of text files, bounded to ``max_bytes`` (counted as characters of text).
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (path, minify) -> (mtime_ns, file size, sha256, text)
+        self._lock = threading.Lock()
+
+    def get(self, path, minify=False):
+        """
+        Content of ``path`` (minified if asked), read from disk only if it is not cached or has changed.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), minify)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+
+        with open(path, 'rb') as file:
+            raw = file.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if entry is not None and entry[2] == digest:
+            # touched but not modified: keep the cached text
+            text = entry[3]
+        else:
+            text = raw.decode('utf-8')
+            if minify:
+                text = minify_html(text)
+
+        with self._lock:
+            self._discard(key)
+            if len(text) <= self.max_bytes:
+                self._entries[key] = (stat.st_mtime_ns, stat.st_size, digest, text)
+                self.size += len(text)
+                while self.size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+        return text
+
+    def digest(self, path, minify=False):
+        """
+        sha256 of the cached version of ``path``.
+        """
+        self.get(path, minify)
+        with self._lock:
+            entry = self._entries.get((os.path.abspath(path), minify))
+        return entry[2] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[3])
+
+
+# one cache per process, shared by all the Streamlit sessions
+artifacts = ArtifactCache()
+
+
+def read_html(path, minify=True):
+    """
+    Cached content of a prebuilt HTML file.
+    """
+    return artifacts.get(path, minify)
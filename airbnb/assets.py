@@ -0,0 +1,103 @@
+"""
+Static images of the app.
+
+The images of img/ are large PNGs (the background alone is 3.3 MB) that the app used to base64-encode on every rerun
+and inline in the page. They are converted once, at build time, to resized WebP files in static/, which Streamlit
+serves as plain files (``enableStaticServing`` in .streamlit/config.toml): the browser downloads them once and
+revalidates them afterwards, and the page only carries their URL. The file names include a hash of their content,
+so a rebuilt image never hits a stale copy.
+
+    python -m airbnb.assets
+"""
+import hashlib
+import io
+import json
+import os
+
+STATIC_DIR = "static"
+MANIFEST_PATH = os.path.join(STATIC_DIR, "assets.json")
+# URL of the files of STATIC_DIR (relative to the page)
+STATIC_URL = "app/static"
+QUALITY = 80
+# widths (px) of the variants of each image; None = original size (images are never enlarged)
+ASSETS = {
+    "img/rome_background.png": [None, 1024],
+    "img/mask.png": [None],
+    "img/nube_airbnb.png": [1408, 704],
+}
+
+
+def _encode(image, width):
+    from PIL import Image
+
+    if width is not None and width < image.width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=QUALITY, method=6)
+    return image.width, buffer.getvalue()
+
+
+def build_assets(assets=ASSETS, static_dir=STATIC_DIR):
+    """
+    Write the WebP variants of ``assets`` to ``static_dir`` and a manifest {source: [{width, file}, ...]}.
+    Returns the manifest.
+    """
+    from PIL import Image
+
+    os.makedirs(static_dir, exist_ok=True)
+    manifest = {}
+    for source, widths in assets.items():
+        image = Image.open(source)
+        image.load()
+        name = os.path.splitext(os.path.basename(source))[0]
+        variants = []
+        for width in widths:
+            actual_width, data = _encode(image, width)
+            file_name = f"{name}-{actual_width}.{hashlib.sha256(data).hexdigest()[:10]}.webp"
+            with open(os.path.join(static_dir, file_name), 'wb') as out:
+                out.write(data)
+            variants.append({'width': actual_width, 'file': file_name})
+        manifest[source] = sorted(variants, key=lambda variant: variant['width'])
+
+    # remove the variants of previous builds
+    files = {variant['file'] for variants in manifest.values() for variant in variants}
+    for file_name in os.listdir(static_dir):
+        if file_name.endswith('.webp') and file_name not in files:
+            os.remove(os.path.join(static_dir, file_name))
+    with open(os.path.join(static_dir, os.path.basename(MANIFEST_PATH)), 'w') as json_file:
+        json.dump(manifest, json_file, indent=2)
+    return manifest
+
+
+_manifest = None
+
+
+def _load_manifest(manifest_path=MANIFEST_PATH):
+    global _manifest
+    if _manifest is None:
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, 'r') as json_file:
+            _manifest = json.load(json_file)
+    return _manifest
+
+
+def asset_url(source, width=None):
+    """
+    URL of the static variant of ``source`` for a display ``width`` (the smallest variant at least as wide,
+    the largest one if None). None if the assets have not been built.
+    """
+    variants = _load_manifest().get(source)
+    if not variants:
+        return None
+    if width is not None:
+        for variant in variants:
+            if variant['width'] >= width:
+                return f"{STATIC_URL}/{variant['file']}"
+    return f"{STATIC_URL}/{variants[-1]['file']}"
+
+
+if __name__ == "__main__":
+    for source, variants in build_assets().items():
+        sizes = ', '.join(f"{v['width']} px {os.path.getsize(os.path.join(STATIC_DIR, v['file'])) / 1e3:.0f} kB" for v in variants)
+        print(f"{source} ({os.path.getsize(source) / 1e3:.0f} kB): {sizes}")
@@ -0,0 +1,104 @@
+"""
+Spearman correlation matrix of the "Other information" page.
+
+The rank transform is the expensive part of a Spearman correlation, so it is done once per dataset version:
+each column is factorized into dense codes (the position of each value among the sorted distinct values).
+The ranks of the listings, or of any subset of them (e.g. a neighbourhood), are then obtained from those codes
+with a bincount and a cumulative sum, without sorting again, and the matrix is the Pearson correlation of the ranks
+(one matrix product). The result is the same as ``df.corr(method='spearman')``.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+CORR_COLUMNS = ['host_response_rate', 'host_acceptance_rate', 'host_is_superhost', 'host_listings_count',
+                'host_has_profile_pic', 'accommodates', 'price', 'availability_30', 'availability_60', 'availability_90',
+                'number_of_reviews', 'review_scores_rating', 'review_scores_location', 'reviews_per_month']
+
+
+def build_ranks(df, columns=CORR_COLUMNS):
+    """
+    Dense codes of ``columns`` (booleans count as 0/1). Returns a dict with the ``columns``,
+    the ``codes`` (n x columns, -1 for missing values) and the number of distinct values of each column (``sizes``).
+    """
+    codes = np.empty((len(df), len(columns)), dtype='int32')
+    sizes = []
+    for j, col in enumerate(columns):
+        column_codes, uniques = pd.factorize(df[col].astype('float64'), sort=True)
+        codes[:, j] = column_codes
+        sizes.append(len(uniques))
+    return {'columns': list(columns), 'codes': codes, 'sizes': np.array(sizes)}
+
+
+def _average_ranks(codes, size):
+    """
+    Average ranks (1-based, ties get the mean rank) of the values with the given codes.
+    """
+    counts = np.bincount(codes, minlength=size)
+    return (np.cumsum(counts) - (counts - 1) / 2)[codes]
+
+
+def _pearson(x, y):
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt((x @ x) * (y @ y))
+    return (x @ y) / denominator if denominator > 0 else np.nan
+
+
+def spearman(ranks, rows=None):
+    """
+    Spearman correlation matrix of all the listings, or of the ``rows`` (boolean mask or positions) only.
+    Missing values are excluded pair by pair, like pandas.
+    """
+    codes = ranks['codes'] if rows is None else ranks['codes'][rows]
+    columns, sizes = ranks['columns'], ranks['sizes']
+    m = len(columns)
+    valid = codes >= 0
+
+    if valid.all():
+        if len(codes) < 2:
+            return pd.DataFrame(np.nan, index=columns, columns=columns)
+        # no missing values: rank each column once and correlate all of them at once
+        r = np.column_stack([_average_ranks(codes[:, j], sizes[j]) for j in range(m)])
+        r -= r.mean(axis=0)
+        norms = np.sqrt((r * r).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = (r.T @ r) / np.outer(norms, norms)
+        # constant columns have no correlation
+        corr[norms == 0, :] = np.nan
+        corr[:, norms == 0] = np.nan
+        np.fill_diagonal(corr, np.where(norms > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(corr, -1, 1), index=columns, columns=columns)
+
+    corr = np.full((m, m), np.nan)
+    for i in range(m):
+        for j in range(i, m):
+            both = valid[:, i] & valid[:, j]
+            if both.sum() < 2:
+                continue
+            x = _average_ranks(codes[both, i], sizes[i])
+            y = _average_ranks(codes[both, j], sizes[j])
+            corr[i, j] = corr[j, i] = np.clip(_pearson(x, y), -1, 1)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def render_heatmap(corr, dpi=80):
+    """
+    PNG of the heatmap of the page (lower triangle, annotated). Uses a matplotlib Figure instead of pyplot,
+    so that several sessions can draw at the same time.
+    """
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(15, 13))
+    ax = fig.subplots()
+    # Generate a mask for the upper triangle
+    mask = np.triu(np.ones_like(corr, dtype=bool))
+    # Generate a custom diverging colormap
+    cmap = sns.diverging_palette(145, 300, s=60, as_cmap=True)
+    sns.heatmap(corr, mask=mask, cmap=cmap, vmax=1, center=0, vmin=-1,
+                square=True, linewidths=1, cbar_kws={"shrink": 1}, annot=True, ax=ax)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
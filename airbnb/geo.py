@@ -0,0 +1,186 @@
+"""
+Neighbourhood (municipio) boundaries and point-in-polygon join of the listings.
+
+outputs/geo_final.csv stores the boundaries as WKT strings, which have to be parsed every time they are used.
+They are converted once to a GeoParquet file (WKB geometries). A simplified copy of the geometries for each
+zoom level of the map is written to a second file (same rows, one column per zoom): at low zoom a vertex every
+few metres is invisible and only makes the GeoJSON sent to the browser heavier. Keeping the copies apart leaves
+the main file smaller than the CSV, and a read at a given zoom only decodes the geometries of that zoom.
+
+The join builds an STRtree over the polygons and queries all the points at once to get the candidate polygons
+of each point (bounding boxes); the candidates are then tested against the prepared polygons with contains_xy,
+one vectorised call per polygon, so assigning millions of coordinates to their municipio takes seconds.
+
+    python -m airbnb.geo
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from airbnb.tiles import MIN_ZOOM
+
+CSV_PATH = "outputs/geo_final.csv"
+BOUNDARIES_PATH = "outputs/neighbourhoods.parquet"
+SIMPLIFIED_PATH = "outputs/neighbourhoods_simplified.parquet"
+# zoom levels with a simplified copy of the geometries; above them the full geometries are used
+SIMPLIFY_ZOOMS = range(MIN_ZOOM, 15)
+TILE_SIZE = 256
+
+
+# ---------------------BOUNDARIES----------------------#
+
+def simplify_tolerance(zoom):
+    """
+    Tolerance (in degrees) of half a pixel at ``zoom``.
+    """
+    return 360 / (TILE_SIZE * 2 ** zoom) / 2
+
+
+def _geometry_column(zoom=None):
+    if zoom is None or zoom > max(SIMPLIFY_ZOOMS):
+        return 'geometry'
+    return f'geometry_z{max(zoom, min(SIMPLIFY_ZOOMS))}'
+
+
+def _write_geoparquet(columns, geometries, path, primary_column):
+    # GeoParquet metadata, so that GeoPandas and other tools read the file as geometries
+    geometry_types = sorted(set(shapely.get_type_id(geometries).tolist()))
+    type_names = {3: 'Polygon', 6: 'MultiPolygon'}
+    metadata = {
+        'version': '1.0.0',
+        'primary_column': primary_column,
+        'columns': {name: {'encoding': 'WKB', 'geometry_types': [type_names.get(t, 'Unknown') for t in geometry_types],
+                           'crs': None, 'bbox': list(shapely.total_bounds(geometries))}
+                    for name in columns if name.startswith('geometry')},
+    }
+    table = pa.table(columns).replace_schema_metadata({'geo': json.dumps(metadata)})
+    pq.write_table(table, path, compression='zstd')
+
+
+def build_boundaries(csv_path=CSV_PATH, path=BOUNDARIES_PATH, simplified_path=SIMPLIFIED_PATH):
+    """
+    Convert the WKT boundaries of ``csv_path`` to a GeoParquet file with the geometries as WKB (the other columns
+    are kept), and write one simplified geometry column per zoom of SIMPLIFY_ZOOMS to ``simplified_path``.
+    """
+    df = pd.read_csv(csv_path)
+    geometries = shapely.from_wkt(df['geometry'].to_numpy())
+    columns = {col: pa.array(df[col]) for col in df.columns if col != 'geometry'}
+    columns['geometry'] = pa.array(shapely.to_wkb(geometries), type=pa.binary())
+    _write_geoparquet(columns, geometries, path, 'geometry')
+
+    simplified = {}
+    for zoom in SIMPLIFY_ZOOMS:
+        geometries_zoom = shapely.simplify(geometries, simplify_tolerance(zoom), preserve_topology=True)
+        simplified[_geometry_column(zoom)] = pa.array(shapely.to_wkb(geometries_zoom), type=pa.binary())
+    _write_geoparquet(simplified, geometries, simplified_path, _geometry_column(max(SIMPLIFY_ZOOMS)))
+    return path
+
+
+def read_boundaries(zoom=None, path=BOUNDARIES_PATH, csv_path=CSV_PATH, simplified_path=SIMPLIFIED_PATH):
+    """
+    Boundaries with their attributes and a ``geometry`` column of shapely geometries,
+    simplified for ``zoom`` (the full geometries if None). Falls back to the CSV if the GeoParquet files have not been built.
+    """
+    column = _geometry_column(zoom)
+    if not os.path.exists(path) or (column != 'geometry' and not os.path.exists(simplified_path)):
+        df = pd.read_csv(csv_path)
+        df['geometry'] = shapely.from_wkt(df['geometry'].to_numpy())
+        if zoom is not None and zoom <= max(SIMPLIFY_ZOOMS):
+            df['geometry'] = shapely.simplify(df['geometry'].to_numpy(), simplify_tolerance(zoom), preserve_topology=True)
+        return df
+
+    if column == 'geometry':
+        df = pq.read_table(path).to_pandas()
+        geometries = df['geometry'].to_numpy()
+    else:
+        attributes = [name for name in pq.read_schema(path).names if name != 'geometry']
+        df = pq.read_table(path, columns=attributes).to_pandas()
+        geometries = pq.read_table(simplified_path, columns=[column]).column(0).to_numpy(zero_copy_only=False)
+    df['geometry'] = shapely.from_wkb(geometries)
+    return df
+
+
+def to_geojson(boundaries, properties=None):
+    """
+    GeoJSON FeatureCollection of ``boundaries`` (as returned by read_boundaries()) with ``properties``
+    (columns of ``boundaries``, all of them by default), e.g. for a folium.Choropleth.
+    """
+    properties = [col for col in boundaries.columns if col != 'geometry'] if properties is None else list(properties)
+    geometries = shapely.to_geojson(boundaries['geometry'].to_numpy())
+    records = boundaries[properties].astype(object).where(boundaries[properties].notna(), None).to_dict('records')
+    features = [{'type': 'Feature', 'properties': record, 'geometry': json.loads(geometry)}
+                for record, geometry in zip(records, geometries)]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+# ---------------------SPATIAL JOIN----------------------#
+
+class NeighbourhoodIndex:
+    """
+    STRtree of the neighbourhood polygons to locate points in bulk.
+
+    index = NeighbourhoodIndex.from_boundaries(read_boundaries())
+    df['neighbourhood'] = index.locate(df['latitude'], df['longitude'])
+    """
+
+    def __init__(self, names, geometries):
+        self.names = pd.Categorical(names).categories
+        self.codes = pd.Categorical(names, categories=self.names).codes
+        self.geometries = np.asarray(geometries)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def from_boundaries(cls, boundaries, name_column='neighbourhood'):
+        return cls(boundaries[name_column].to_numpy(), boundaries['geometry'].to_numpy())
+
+    def locate_codes(self, lat, lon):
+        """
+        Position in ``names`` of the neighbourhood of each point, -1 for the points outside all of them
+        (or exactly on a border).
+        """
+        lat = np.asarray(lat, dtype='float64')
+        lon = np.asarray(lon, dtype='float64')
+        codes = np.full(len(lat), -1, dtype='int16')
+        point_idx, polygon_idx = self.tree.query(shapely.points(lon, lat))
+        # candidate points of each polygon
+        order = np.argsort(polygon_idx, kind='stable')
+        point_idx, polygon_idx = point_idx[order], polygon_idx[order]
+        bounds = np.searchsorted(polygon_idx, np.arange(len(self.geometries) + 1))
+        for polygon, geometry in enumerate(self.geometries):
+            candidates = point_idx[bounds[polygon]:bounds[polygon + 1]]
+            candidates = candidates[codes[candidates] < 0]
+            inside = shapely.contains_xy(geometry, lon[candidates], lat[candidates])
+            codes[candidates[inside]] = self.codes[polygon]
+        return codes
+
+    def locate(self, lat, lon):
+        """
+        Name of the neighbourhood of each point (NaN outside all of them), as a categorical.
+        """
+        return pd.Categorical.from_codes(self.locate_codes(lat, lon), categories=self.names)
+
+
+def check_neighbourhoods(df, index=None):
+    """
+    Listings of ``df`` (with latitude, longitude and neighbourhood_cleansed) whose coordinates are not in their
+    neighbourhood_cleansed. Returns those rows with the ``located`` neighbourhood.
+    """
+    if index is None:
+        index = NeighbourhoodIndex.from_boundaries(read_boundaries())
+    located = pd.Series(index.locate(df['latitude'], df['longitude']), index=df.index, name='located')
+    expected = df['neighbourhood_cleansed'].astype(object)
+    mismatch = located.astype(object).ne(expected) & ~(located.isna() & expected.isna())
+    return df[mismatch].assign(located=located[mismatch])
+
+
+if __name__ == "__main__":
+    path = build_boundaries()
+    print(f"Boundaries written to {path} ({os.path.getsize(path) / 1e3:.0f} kB, "
+          f"{os.path.getsize(CSV_PATH) / 1e3:.0f} kB as WKT) and the simplified copies to {SIMPLIFIED_PATH} "
+          f"({os.path.getsize(SIMPLIFIED_PATH) / 1e3:.0f} kB)")
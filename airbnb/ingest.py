@@ -0,0 +1,193 @@
+"""
+Streaming ingestion of the Inside Airbnb files into a local columnar cache.
+
+The gzipped CSVs (listings, calendar and reviews) are read in chunks with ``usecols`` and explicit dtypes.
+Each chunk is cast, cleaned and projected, then appended as a row group to a Parquet file of the cache:
+
+    cache/<dataset>/city=<city>/snapshot=<date>/part-0.parquet
+
+so peak memory is one chunk, whatever the size of the file. A manifest next to each partition
+records the source file it was built from: re-running the ingestion skips the files that did not change.
+Everything works offline from local copies of the files.
+
+Only per-row steps are done here; the steps that need the whole table (filling nulls with the mean,
+repairing outliers...) run afterwards on the cached, much smaller, data (see airbnb/preprocessing.py).
+
+    python -m airbnb.ingest data/rome/2023-12-15 --city rome --snapshot 2023-12-15
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from airbnb.preprocessing import repair_percentage, repair_price
+
+CACHE_DIR = "cache"
+CHUNKSIZE = 200_000
+MANIFEST = "_manifest.json"
+
+
+# ---------------------DATASETS----------------------#
+
+def _flag(col):
+    return col.map({'t': True, 'f': False}).astype('boolean')
+
+
+def _clean_listings(chunk):
+    chunk['price'] = repair_price(chunk['price'])
+    chunk['host_response_rate'] = repair_percentage(chunk['host_response_rate'])
+    chunk['host_acceptance_rate'] = repair_percentage(chunk['host_acceptance_rate'])
+    chunk['host_is_superhost'] = _flag(chunk['host_is_superhost'])
+    chunk['host_has_profile_pic'] = _flag(chunk['host_has_profile_pic'])
+    chunk['host_since'] = pd.to_datetime(chunk['host_since'], errors='coerce')
+    # some nulls are '[]' instead of NaN
+    chunk['host_location'] = chunk['host_location'].mask(chunk['host_location'] == '[]')
+    return chunk
+
+
+def _clean_calendar(chunk):
+    chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+    chunk['available'] = _flag(chunk['available'])
+    chunk['price'] = repair_price(chunk['price'])
+    return chunk
+
+
+def _clean_reviews(chunk):
+    chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+    return chunk
+
+
+# for each dataset: source file, columns to read with their dtypes, cleaning function and schema of the cache
+DATASETS = {
+    'listings': {
+        'file': 'listings.csv.gz',
+        'dtype': {'id': 'int64', 'beds': 'float64', 'longitude': 'float64', 'latitude': 'float64', 'host_id': 'int64',
+                  'host_listings_count': 'float64', 'accommodates': 'int64', 'availability_30': 'int64',
+                  'availability_60': 'int64', 'availability_90': 'int64', 'number_of_reviews': 'int64',
+                  'review_scores_rating': 'float64', 'review_scores_location': 'float64', 'reviews_per_month': 'float64',
+                  **{col: 'string' for col in ['host_since', 'host_location', 'host_response_rate', 'host_acceptance_rate',
+                                               'host_is_superhost', 'host_has_profile_pic', 'neighbourhood_cleansed',
+                                               'property_type', 'room_type', 'bathrooms_text', 'price']}},
+        'clean': _clean_listings,
+        'schema': pa.schema([('id', pa.int64()), ('beds', pa.float32()), ('longitude', pa.float64()), ('latitude', pa.float64()),
+                             ('host_id', pa.int64()), ('host_since', pa.timestamp('ns')), ('host_location', pa.string()),
+                             ('host_response_rate', pa.float32()), ('host_acceptance_rate', pa.float32()),
+                             ('host_is_superhost', pa.bool_()), ('host_listings_count', pa.float32()),
+                             ('host_has_profile_pic', pa.bool_()), ('neighbourhood_cleansed', pa.string()),
+                             ('property_type', pa.string()), ('room_type', pa.string()), ('accommodates', pa.int16()),
+                             ('bathrooms_text', pa.string()), ('price', pa.float64()), ('availability_30', pa.int16()),
+                             ('availability_60', pa.int16()), ('availability_90', pa.int16()),
+                             ('number_of_reviews', pa.int32()), ('review_scores_rating', pa.float32()),
+                             ('review_scores_location', pa.float32()), ('reviews_per_month', pa.float32())]),
+    },
+    'calendar': {
+        'file': 'calendar.csv.gz',
+        'dtype': {'listing_id': 'int64', 'date': 'string', 'available': 'string', 'price': 'string',
+                  'minimum_nights': 'float64', 'maximum_nights': 'float64'},
+        'clean': _clean_calendar,
+        'schema': pa.schema([('listing_id', pa.int64()), ('date', pa.timestamp('ns')), ('available', pa.bool_()),
+                             ('price', pa.float64()), ('minimum_nights', pa.float32()), ('maximum_nights', pa.float32())]),
+    },
+    'reviews': {
+        'file': 'reviews.csv.gz',
+        'dtype': {'listing_id': 'int64', 'id': 'int64', 'date': 'string', 'reviewer_id': 'int64', 'comments': 'string'},
+        'clean': _clean_reviews,
+        'schema': pa.schema([('listing_id', pa.int64()), ('id', pa.int64()), ('date', pa.timestamp('ns')),
+                             ('reviewer_id', pa.int64()), ('comments', pa.string())]),
+    },
+}
+
+
+# ---------------------INGESTION----------------------#
+
+def _source_path(source_dir, name):
+    """
+    Path of the gzipped file, or of its uncompressed copy.
+    """
+    path = os.path.join(source_dir, name)
+    if not os.path.exists(path) and os.path.exists(path[:-len('.gz')]):
+        return path[:-len('.gz')]
+    return path
+
+
+def partition_dir(dataset, city, snapshot, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, dataset, f"city={city}", f"snapshot={snapshot}")
+
+
+def ingest_file(dataset, source, city, snapshot, cache_dir=CACHE_DIR, chunksize=CHUNKSIZE, force=False):
+    """
+    Stream one source file into its cache partition. Returns the number of rows written,
+    or None if the partition is already up to date.
+    """
+    spec = DATASETS[dataset]
+    stat = os.stat(source)
+    manifest = {'source': os.path.basename(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    out_dir = partition_dir(dataset, city, snapshot, cache_dir)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as json_file:
+            done = json.load(json_file)
+        if {key: done.get(key) for key in manifest} == manifest:
+            return None
+
+    # write next to the partition and swap at the end, so an interrupted run never leaves a half partition
+    # (the dot hides the temporary folder from the dataset readers)
+    tmp_dir = os.path.join(os.path.dirname(out_dir), '.' + os.path.basename(out_dir) + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    rows = 0
+    schema = spec['schema']
+    with pq.ParquetWriter(os.path.join(tmp_dir, 'part-0.parquet'), schema, compression='zstd') as writer:
+        reader = pd.read_csv(source, usecols=schema.names, dtype=spec['dtype'], chunksize=chunksize)
+        for chunk in reader:
+            chunk = spec['clean'](chunk)[schema.names]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False, safe=False))
+            rows += len(chunk)
+
+    manifest.update(rows=rows, ingested_at=time.time())
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as json_file:
+        json.dump(manifest, json_file)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return rows
+
+
+def ingest(source_dir, city, snapshot, cache_dir=CACHE_DIR, datasets=tuple(DATASETS), chunksize=CHUNKSIZE, force=False):
+    """
+    Ingest the Inside Airbnb files of ``source_dir`` (one city and snapshot).
+    Returns {dataset: rows written, or None if it was up to date}. Missing files are skipped.
+    """
+    results = {}
+    for dataset in datasets:
+        source = _source_path(source_dir, DATASETS[dataset]['file'])
+        if os.path.exists(source):
+            results[dataset] = ingest_file(dataset, source, city, snapshot, cache_dir, chunksize, force)
+    return results
+
+
+def read_cache(dataset, columns=None, filters=None, cache_dir=CACHE_DIR):
+    """
+    Read a cached dataset (all cities and snapshots unless ``filters`` says otherwise,
+    e.g. ``[('city', '=', 'rome'), ('snapshot', '=', '2023-12-15')]``).
+    """
+    dataset = ds.dataset(os.path.join(cache_dir, dataset), format='parquet', partitioning='hive')
+    return dataset.to_table(columns=columns, filter=pq.filters_to_expression(filters) if filters else None).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the Inside Airbnb files of a city snapshot into the local cache.")
+    parser.add_argument('source_dir', help='folder with listings.csv.gz, calendar.csv.gz and reviews.csv.gz')
+    parser.add_argument('--city', required=True)
+    parser.add_argument('--snapshot', required=True, help='date of the Inside Airbnb snapshot, e.g. 2023-12-15')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--force', action='store_true', help='ingest the files even if they did not change')
+    args = parser.parse_args()
+    for name, rows in ingest(args.source_dir, args.city, args.snapshot, args.cache_dir, chunksize=args.chunksize, force=args.force).items():
+        print(f"{name}: {'up to date' if rows is None else f'{rows} rows'}")
@@ -0,0 +1,311 @@
+"""
+Instrumentation of the app: where a rerun spends its time and memory.
+
+- spans: duration of the data and model steps (``with metrics.span(name):``) and of the page sections
+  (``metrics.section(name)``, which lasts until the next section or the end of the rerun, so the flat page code
+  does not need to be indented);
+- cache counters: calls and misses of the st.cache_data loaders (``@metrics.cached(st.cache_data())``);
+- memory: resident memory of the process at the end of each rerun, and the Python allocations if tracemalloc
+  is on (``AIRBNB_METRICS_TRACEMALLOC=1``, it slows the app down).
+
+The totals of the process are exported as Prometheus text by an HTTP endpoint started in a thread
+(``AIRBNB_METRICS_PORT=9464`` -> http://localhost:9464/metrics), and each rerun can be logged as one JSON line
+(``AIRBNB_METRICS_LOG=1``). The spans of the rerun are also returned by end_rerun() for the debug panel of the app.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG_ENV = "AIRBNB_METRICS_LOG"
+PORT_ENV = "AIRBNB_METRICS_PORT"
+TRACEMALLOC_ENV = "AIRBNB_METRICS_TRACEMALLOC"
+# upper bounds (seconds) of the buckets of the duration histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+logger = logging.getLogger(__name__)
+
+
+def rss_bytes():
+    """
+    Resident memory of the process, in bytes (None if it cannot be read).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def peak_rss_bytes():
+    """
+    Peak resident memory of the process, in bytes (None if unknown).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Thread-safe totals of the process, plus the trace of the rerun running in each thread
+    (Streamlit runs each session's script in its own thread).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.spans = {}  # name -> [count, total seconds, max seconds, count per bucket]
+        self.caches = {}  # loader name -> [calls, misses]
+        self.reruns = {}  # page -> count
+        self.log = os.environ.get(LOG_ENV, '') not in ('', '0')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._server = None
+        self._collectors = {}
+
+    # ---------------------SPANS----------------------#
+
+    def record(self, name, seconds):
+        """
+        Add a duration to the totals of ``name`` and to the trace of the current rerun.
+        """
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = [0, 0.0, 0.0, [0] * len(self.buckets)]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats[3][i] += 1
+                    break
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            rerun['spans'].append((name, seconds))
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Time the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def section(self, name):
+        """
+        Start timing a section of the page; the previous section (if any) ends here.
+        """
+        self._end_section()
+        self._local.section = (name, time.perf_counter())
+
+    def _end_section(self):
+        section = getattr(self._local, 'section', None)
+        if section is not None:
+            self._local.section = None
+            self.record(section[0], time.perf_counter() - section[1])
+
+    # ---------------------CACHES----------------------#
+
+    def _count(self, name, miss):
+        with self._lock:
+            stats = self.caches.setdefault(name, [0, 0])
+            stats[miss] += 1
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            stats = rerun['caches'].setdefault(name, [0, 0])
+            stats[miss] += 1
+
+    def cached(self, cache):
+        """
+        Decorator: apply the ``cache`` decorator (e.g. ``st.cache_data()``) to a loader, counting its calls and misses
+        (the function only runs when the cache misses) and timing the calls.
+        """
+        def decorate(func):
+            name = func.__name__
+
+            @functools.wraps(func)
+            def compute(*args, **kwargs):
+                self._count(name, miss=True)
+                return func(*args, **kwargs)
+
+            cached_func = cache(compute)
+
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                self._count(name, miss=False)
+                with self.span(name):
+                    return cached_func(*args, **kwargs)
+
+            call.clear = cached_func.clear
+            return call
+        return decorate
+
+    # ---------------------RERUNS----------------------#
+
+    def begin_rerun(self, page=None):
+        """
+        Start the trace of a rerun of the script (the trace of an interrupted rerun is dropped).
+        """
+        self._local.section = None
+        self._local.rerun = {'page': page, 'start': time.perf_counter(), 'spans': [], 'caches': {}}
+
+    def set_page(self, page):
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            rerun['page'] = page
+
+    def end_rerun(self):
+        """
+        End the trace of the rerun: record its duration and take a memory snapshot.
+        Returns the trace {page, seconds, spans, caches, memory}, logged as JSON if enabled.
+        """
+        self._end_section()
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is None:
+            return None
+        self._local.rerun = None
+        seconds = time.perf_counter() - rerun['start']
+        page = rerun['page']
+        self.record(f"rerun/{page}", seconds)
+        with self._lock:
+            self.reruns[page] = self.reruns.get(page, 0) + 1
+
+        trace = {'page': page, 'seconds': round(seconds, 6),
+                 'spans': [{'name': name, 'seconds': round(s, 6)} for name, s in rerun['spans']],
+                 'caches': {name: {'hits': calls - misses, 'misses': misses} for name, (calls, misses) in rerun['caches'].items()},
+                 'memory': self.memory()}
+        if self.log:
+            logger.info(json.dumps(trace))
+        return trace
+
+    # ---------------------MEMORY----------------------#
+
+    @staticmethod
+    def memory():
+        """
+        Memory snapshot of the process (bytes).
+        """
+        snapshot = {'rss': rss_bytes(), 'peak_rss': peak_rss_bytes()}
+        if tracemalloc.is_tracing():
+            snapshot['traced'], snapshot['traced_peak'] = tracemalloc.get_traced_memory()
+        return snapshot
+
+    # ---------------------EXPORT----------------------#
+
+    def add_collector(self, name, collect):
+        """
+        Export the numeric values of the dict returned by ``collect()`` (e.g. the stats of another cache)
+        as gauges ``airbnb_<name>_<key>``, read at each scrape.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def prometheus(self):
+        """
+        Totals of the process in the Prometheus text format.
+        """
+        with self._lock:
+            spans = {name: (count, total, list(buckets)) for name, (count, total, _, buckets) in self.spans.items()}
+            caches = {name: tuple(stats) for name, stats in self.caches.items()}
+            reruns = dict(self.reruns)
+            collectors = dict(self._collectors)
+
+        lines = ['# HELP airbnb_span_seconds Duration of the steps and sections of the app.',
+                 '# TYPE airbnb_span_seconds histogram']
+        for name, (count, total, buckets) in sorted(spans.items()):
+            label = f'span="{_escape(name)}"'
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                lines.append(f'airbnb_span_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'airbnb_span_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'airbnb_span_seconds_sum{{{label}}} {total}')
+            lines.append(f'airbnb_span_seconds_count{{{label}}} {count}')
+
+        lines += ['# HELP airbnb_cache_requests_total Calls of the cached loaders, by result.',
+                  '# TYPE airbnb_cache_requests_total counter']
+        for name, (calls, misses) in sorted(caches.items()):
+            lines.append(f'airbnb_cache_requests_total{{cache="{_escape(name)}",result="hit"}} {calls - misses}')
+            lines.append(f'airbnb_cache_requests_total{{cache="{_escape(name)}",result="miss"}} {misses}')
+
+        lines += ['# HELP airbnb_reruns_total Reruns of the script, by page.', '# TYPE airbnb_reruns_total counter']
+        lines += [f'airbnb_reruns_total{{page="{_escape(page)}"}} {count}' for page, count in sorted(reruns.items(), key=str)]
+
+        for name, value in self.memory().items():
+            if value is not None:
+                lines += [f'# TYPE airbnb_memory_{name}_bytes gauge', f'airbnb_memory_{name}_bytes {value}']
+
+        for name, collect in sorted(collectors.items()):
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f'# TYPE airbnb_{name}_{key} gauge', f'airbnb_{name}_{key} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=None):
+        """
+        Start the /metrics endpoint in a daemon thread (only once per process). ``port`` defaults to
+        AIRBNB_METRICS_PORT; nothing is started if there is none. Returns the port, or None.
+        """
+        port = port if port is not None else os.environ.get(PORT_ENV, '')
+        if port == '':
+            return None
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        with self._lock:
+            if self._server is None:
+                try:
+                    self._server = ThreadingHTTPServer(('', int(port)), Handler)
+                except OSError as error:
+                    # e.g. the port is used by another process of the app: do not try again
+                    logger.warning(f"The metrics endpoint could not be started on port {port}: {error}")
+                    self._server = False
+                    return None
+                threading.Thread(target=self._server.serve_forever, name='metrics-endpoint', daemon=True).start()
+            return self._server.server_address[1] if self._server else None
+
+
+metrics = Metrics()
+
+if metrics.log and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+if os.environ.get(TRACEMALLOC_ENV, '') not in ('', '0') and not tracemalloc.is_tracing():
+    tracemalloc.start()
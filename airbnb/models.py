@@ -0,0 +1,322 @@
+"""
+Process-wide registry of the price predictor.
+
+The model trained in 3_ML_pricepredictor.ipynb is exported once to native XGBoost JSON plus the plain
+scaler parameters (``python -m airbnb.models``), so the app does not need pycaret, joblib or scikit-learn to
+predict (see airbnb/predictor.py). The registry loads and validates those artifacts once per process and
+shares them with every Streamlit session, so a prediction only costs the inference.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from airbnb.metrics import metrics
+from airbnb.predictor import BOOSTER_PATH, ENCODER_PATH, SCALER_PARAMS_PATH, load_predictor
+
+# artifacts saved by the notebook
+MODEL_PATH = "models/price_xbg.pkl"
+SCALER_PATH = "outputs/scaler.pkl"
+DECODER_PATH = "outputs/mapeo_inverso.json"
+# set to 1 to load the predictor when the app starts instead of when the Price predictor page is first opened
+WARM_UP_ENV = "AIRBNB_MODEL_WARM_UP"
+# order of the columns used to train the scaler and the model
+FEATURES = ['beds', 'accommodates', 'bathrooms', 'neighbourhood_cleansed']
+# rows per booster call in the batch predictions
+CHUNK_SIZE = 50_000
+# realistic inputs of the form, precomputed by warm_up()
+GRID = {'beds': range(1, 9), 'accommodates': range(1, 17), 'bathrooms': range(0, 5)}
+
+
+def _file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def export_native_model(model_path=MODEL_PATH, scaler_path=SCALER_PATH, booster_path=BOOSTER_PATH, scaler_params_path=SCALER_PARAMS_PATH):
+    """
+    Convert the pickled booster and StandardScaler of the notebook into native XGBoost JSON and plain scaler parameters.
+    """
+    import xgboost as xgb
+    from joblib import load
+
+    booster = load(model_path)  # the notebook saves a plain xgboost Booster with joblib
+    scaler = load(scaler_path)
+    booster.save_model(booster_path)
+    params = {
+        'features': list(getattr(scaler, 'feature_names_in_', FEATURES)),
+        'mean': scaler.mean_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'xgboost_version': xgb.__version__,
+    }
+    with open(scaler_params_path, 'w') as json_file:
+        json.dump(params, json_file, indent=2)
+    return booster_path, scaler_params_path
+
+
+class PredictionCache:
+    """
+    Predicted prices by canonical input: a bounded LRU cache with a time to live, plus a precomputed table
+    that is never evicted. Everything is dropped when the model version changes.
+    """
+
+    def __init__(self, max_size=10_000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (price, expiry time)
+        self._table = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(beds, accommodates, bathrooms, neighbourhood):
+        """
+        Canonical form of the inputs, so that 2, 2.0 and '2' share an entry.
+        """
+        return float(beds), float(accommodates), float(bathrooms), str(neighbourhood).strip()
+
+    def get(self, key):
+        with self._lock:
+            price = self._table.get(key)
+            if price is None:
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    price = entry[0]
+                elif entry is not None:
+                    del self._entries[key]  # expired
+            if price is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return price
+
+    def put(self, key, price):
+        expiry = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (price, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set_table(self, table):
+        with self._lock:
+            self._table = dict(table)
+
+    def set_model_version(self, version):
+        """
+        Drop every cached price if ``version`` is not the version they were computed with.
+        """
+        with self._lock:
+            if version != self.model_version:
+                self._entries.clear()
+                self._table = {}
+                self.model_version = version
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else None,
+                    'entries': len(self._entries), 'table': len(self._table)}
+
+
+class ModelRegistry:
+    """
+    Loads the predictor artifacts on first use (or on warm_up()) and keeps them in memory.
+    """
+
+    def __init__(self, booster_path=BOOSTER_PATH, scaler_params_path=SCALER_PARAMS_PATH, encoder_path=ENCODER_PATH, decoder_path=DECODER_PATH):
+        self.paths = {'booster': booster_path, 'scaler': scaler_params_path, 'encoder': encoder_path, 'decoder': decoder_path}
+        self.predictor = None
+        self.decoder = None
+        self.versions = {}
+        self.loaded_at = None
+        self.error = None
+        self.cache = PredictionCache()
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        # separate from _lock, which is held during the whole load: starting the warm-up never waits for it
+        self._warm_up_lock = threading.Lock()
+        self._warm_up_thread = None
+
+    @property
+    def encoder(self):
+        return self.predictor.encoder if self.predictor is not None else None
+
+    # ---------------------LOAD----------------------#
+
+    def load(self):
+        """
+        Load and validate every artifact (only the first time). Returns the registry.
+        """
+        if self.loaded_at is not None:
+            return self
+        with self._lock:
+            if self.loaded_at is not None:
+                return self
+            try:
+                mtimes = {name: os.stat(path).st_mtime_ns for name, path in self.paths.items()}
+                with metrics.span("model load"):
+                    predictor = load_predictor(self.paths['booster'], self.paths['scaler'], self.paths['encoder'])
+                    with open(self.paths['decoder'], 'r') as json_file:
+                        decoder = json.load(json_file)
+                    self._validate(predictor, decoder)
+            except Exception as error:
+                self.error = f"{type(error).__name__}: {error}"
+                raise
+            self.predictor, self.decoder = predictor, decoder
+            self.versions = {name: _file_hash(path) for name, path in self.paths.items()}
+            self.versions['xgboost (exported)'] = predictor.xgboost_version
+            self.cache.set_model_version(''.join(self.versions[name] for name in ('booster', 'scaler', 'encoder')))
+            self._mtimes = mtimes
+            self.loaded_at = time.time()
+            self.error = None
+        return self
+
+    def refresh(self):
+        """
+        Reload the artifacts if any of them changed on disk since they were loaded.
+        """
+        if self.loaded_at is None:
+            return self.load()
+        if any(os.stat(path).st_mtime_ns != self._mtimes.get(name) for name, path in self.paths.items()):
+            with self._lock:
+                self.loaded_at = None
+            self.load()
+        return self
+
+    @staticmethod
+    def _validate(predictor, decoder):
+        """
+        Check that the artifacts were exported together, and warn if the model was exported with another xgboost version.
+        """
+        if predictor.features != FEATURES:
+            raise ValueError(f"The scaler was fitted with {predictor.features}, expected {FEATURES}")
+        if not len(predictor.mean) == len(predictor.scale) == predictor.booster.num_features() == len(FEATURES):
+            raise ValueError(f"The scaler and the model do not have {len(FEATURES)} features")
+        if {str(code): name for name, code in predictor.encoder.items()} != decoder:
+            raise ValueError("mapeo.json and mapeo_inverso.json do not match")
+        import xgboost as xgb
+
+        exported_with = predictor.xgboost_version
+        if exported_with and exported_with.split('.')[:2] != xgb.__version__.split('.')[:2]:
+            warnings.warn(f"The model was exported with xgboost {exported_with} and is loaded with {xgb.__version__}")
+
+    # ---------------------WARM-UP & HEALTH----------------------#
+
+    def warm_up(self):
+        """
+        Load the artifacts and precompute the prices of the realistic inputs, so that the first users do not pay for it.
+        """
+        self.load()
+        self.precompute()
+        return self
+
+    def precompute(self, grid=GRID):
+        """
+        Predict every combination of the ``grid`` values and every neighbourhood, and keep them in the cache table.
+        """
+        self.load()
+        rows = list(itertools.product(grid['beds'], grid['accommodates'], grid['bathrooms'], self.encoder))
+        with metrics.span("model precompute"):
+            prices = self.predict_batch(rows)['predicted_price']
+        self.cache.set_table({self.cache.key(*row): float(price) for row, price in zip(rows, prices)})
+
+    def warm_up_in_background(self):
+        """
+        Start warm_up() in a daemon thread (only once per process).
+        """
+        if self._warm_up_thread is not None or self.loaded_at is not None:
+            return
+        with self._warm_up_lock:
+            if self._warm_up_thread is None and self.loaded_at is None:
+                self._warm_up_thread = threading.Thread(target=self._safe_warm_up, name='model-warm-up', daemon=True)
+                self._warm_up_thread.start()
+
+    def _safe_warm_up(self):
+        try:
+            self.warm_up()
+        except Exception:
+            pass  # the error is kept in self.error and reported by health()
+
+    def health(self):
+        """
+        Status of the registry: 'ok', 'not loaded' or 'error', with the artifact versions.
+        """
+        if self.error is not None:
+            status = 'error'
+        elif self.loaded_at is None:
+            status = 'not loaded'
+        else:
+            status = 'ok'
+        return {'status': status, 'loaded_at': self.loaded_at, 'versions': dict(self.versions), 'error': self.error,
+                'cache': self.cache.stats()}
+
+    # ---------------------PREDICTION----------------------#
+
+    def predict(self, beds, accommodates, bathrooms, neighbourhood):
+        """
+        Predicted price per night for one accommodation (cached).
+        """
+        self.refresh()
+        key = self.cache.key(beds, accommodates, bathrooms, neighbourhood)
+        price = self.cache.get(key)
+        if price is None:
+            code = self.predictor.encode([key[3]])[0]
+            price = float(self.predictor.predict([key[0], key[1], key[2], code])[-1])
+            self.cache.put(key, price)
+        return price
+
+    def iter_predict_batch(self, rows, chunk_size=CHUNK_SIZE):
+        """
+        Predict the price of many accommodations. ``rows`` is a dataframe with the FEATURES columns
+        or a list of (beds, accommodates, bathrooms, neighbourhood) tuples.
+
+        The rows are encoded into one numeric array in a vectorised pass, then predicted in batches of
+        ``chunk_size`` rows. Yields the input rows of each batch with a ``predicted_price`` column.
+        """
+        self.load()
+        if isinstance(rows, pd.DataFrame):
+            missing = [col for col in FEATURES if col not in rows]
+            if missing:
+                raise ValueError(f"Missing columns: {missing}")
+            input_data = rows[FEATURES].reset_index(drop=True)
+        else:
+            input_data = pd.DataFrame(list(rows), columns=FEATURES)
+
+        # 1- Encode the neighbourhoods into numbers using the mapping json.
+        codes = input_data['neighbourhood_cleansed'].map(self.encoder)
+        unknown = input_data.loc[codes.isna(), 'neighbourhood_cleansed'].unique()
+        if len(unknown):
+            raise ValueError(f"Unknown neighbourhoods: {list(unknown)}")
+        features = np.column_stack([input_data[FEATURES[:-1]].to_numpy(dtype='float64'), codes.to_numpy(dtype='float64')])
+        # 2 - Normalise and predict with the trained model, batch by batch
+        for start in range(0, len(input_data), chunk_size):
+            stop = start + chunk_size
+            prediction = self.predictor.predict(features[start:stop])
+            yield input_data.iloc[start:stop].assign(predicted_price=prediction)
+
+    def predict_batch(self, rows, chunk_size=CHUNK_SIZE):
+        """
+        Same as iter_predict_batch(), but returns all the predictions in one dataframe.
+        """
+        chunks = list(self.iter_predict_batch(rows, chunk_size))
+        return pd.concat(chunks) if chunks else pd.DataFrame(columns=FEATURES + ['predicted_price'])
+
+
+registry = ModelRegistry()
+metrics.add_collector('prediction_cache', lambda: registry.cache.stats())
+
+
+if __name__ == "__main__":
+    for path in export_native_model():
+        print(f"Written {path}")
@@ -0,0 +1,61 @@
+"""
+Minimal price predictor that only depends on numpy and xgboost.
+
+It uses the artifacts exported by ``python -m airbnb.models``:
+
+- models/price_xbg.json: the XGBoost booster in its native JSON format
+- models/scaler.json: the StandardScaler parameters (features, mean and scale) and the XGBoost version of the export
+- outputs/mapeo.json: the neighbourhood encoder
+"""
+import json
+
+import numpy as np
+
+BOOSTER_PATH = "models/price_xbg.json"
+SCALER_PARAMS_PATH = "models/scaler.json"
+ENCODER_PATH = "outputs/mapeo.json"
+
+
+class Predictor:
+    """
+    Standardise the inputs and predict them with the booster.
+    """
+
+    def __init__(self, booster, features, mean, scale, encoder, xgboost_version=None):
+        self.booster = booster
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype='float64')
+        self.scale = np.asarray(scale, dtype='float64')
+        self.encoder = encoder
+        self.xgboost_version = xgboost_version
+
+    def encode(self, neighbourhoods):
+        """
+        Neighbourhood names -> codes. Raises ValueError for unknown names.
+        """
+        try:
+            return np.array([self.encoder[name] for name in neighbourhoods], dtype='float64')
+        except KeyError as error:
+            raise ValueError(f"Unknown neighbourhood: {error.args[0]!r}") from None
+
+    def predict(self, features):
+        """
+        Predicted prices of an array of shape (n, 4) with beds, accommodates, bathrooms and the encoded neighbourhood.
+        """
+        features = np.asarray(features, dtype='float64').reshape(-1, len(self.features))
+        return self.booster.inplace_predict((features - self.mean) / self.scale)
+
+
+def load_predictor(booster_path=BOOSTER_PATH, scaler_params_path=SCALER_PARAMS_PATH, encoder_path=ENCODER_PATH):
+    """
+    Load the exported booster, scaler parameters and encoder.
+    """
+    import xgboost as xgb  # imported here so that importing this module stays cheap
+
+    booster = xgb.Booster()
+    booster.load_model(booster_path)
+    with open(scaler_params_path, 'r') as json_file:
+        scaler = json.load(json_file)
+    with open(encoder_path, 'r') as json_file:
+        encoder = json.load(json_file)
+    return Predictor(booster, scaler['features'], scaler['mean'], scaler['scale'], encoder, scaler.get('xgboost_version'))
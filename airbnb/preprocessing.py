@@ -0,0 +1,137 @@
+"""
+Preprocessing steps of 1_Preprocessing_EDA.ipynb and 3_ML_pricepredictor.ipynb as importable functions.
+
+The outlier repair is vectorised: the IQR bounds of every column are computed with a single
+``quantile([.25, .75])`` call and the values outside them are replaced with boolean masks,
+instead of visiting the rows one by one.
+"""
+import numpy as np
+import pandas as pd
+
+# working columns of 1_Preprocessing_EDA.ipynb (outputs/airbnb_limpio.csv)
+LISTINGS_COLUMNS = ['longitude', 'latitude', 'host_id', 'host_since', 'host_location', 'host_response_rate',
+                    'host_acceptance_rate', 'host_is_superhost', 'host_listings_count', 'host_has_profile_pic',
+                    'neighbourhood_cleansed', 'property_type', 'room_type', 'accommodates', 'bathrooms_text', 'price',
+                    'availability_30', 'availability_60', 'availability_90', 'number_of_reviews',
+                    'review_scores_rating', 'review_scores_location', 'reviews_per_month']
+# columns filled with the mean / the median
+MEAN_COLUMNS = ['host_response_rate', 'host_acceptance_rate', 'price', 'review_scores_rating',
+                'review_scores_location', 'reviews_per_month']
+MEDIAN_COLUMNS = ['host_listings_count']
+
+
+# ---------------------COLUMN PROCESSING----------------------#
+
+def repair_price(col):
+    """
+    '$1,234.00' -> 1234.0 (NaN stays NaN).
+    """
+    return pd.to_numeric(col.astype('string').str.replace('$', '', regex=False).str.replace(',', '', regex=False)).astype('float64')
+
+
+def repair_percentage(col):
+    """
+    '95%' -> 95.0 (NaN stays NaN).
+    """
+    return pd.to_numeric(col.astype('string').str.replace('%', '', regex=False)).astype('float64')
+
+
+def repair_bathrooms(col):
+    """
+    Number of bathrooms from ``bathrooms_text`` ('1.5 baths' -> 1.5, 'Half-bath' -> 0.5).
+    """
+    bathrooms = col.str.split().str[0].replace(['Half-bath', 'Shared', 'Private'], '0.5')
+    return pd.to_numeric(bathrooms)
+
+
+# ---------------------OUTLIERS----------------------#
+
+def iqr_bounds(df, columns):
+    """
+    Lower and upper IQR bounds (Q1 - 1.5 IQR, Q3 + 1.5 IQR) of ``columns``, with one quantile call.
+    """
+    quartiles = df[columns].quantile([0.25, 0.75])
+    q1, q3 = quartiles.loc[0.25], quartiles.loc[0.75]
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def outliers(df, columns=None):
+    """
+    Number of outliers of each numeric column according to the interquartile ranges.
+    """
+    columns = list(columns) if columns is not None else list(df.select_dtypes('number').columns)
+    lower, upper = iqr_bounds(df, columns)
+    values = df[columns]
+    return ((values < lower) | (values > upper)).sum()
+
+
+def reparar_atipicos(df, columns=None):
+    """
+    Replace the outliers of ``columns`` (all the numeric columns by default) with their IQR bounds.
+
+    ``columns`` can also be a single column name or a Series of ``df``, as in the notebooks
+    (``reparar_atipicos(df, df['price'])``). The dataframe is modified in place and returned.
+
+    The result is the same as the row loop of the notebooks: values above the upper bound take the upper bound,
+    values below the lower bound take the lower bound, NaN are left as they are. (The loop visited the index
+    labels 0..n-1, which for the RangeIndex used in the notebooks are all the rows.)
+    """
+    if isinstance(columns, pd.Series):
+        columns = [columns.name]
+    elif isinstance(columns, str):
+        columns = [columns]
+    elif columns is None:
+        columns = list(df.select_dtypes('number').columns)
+    lower, upper = iqr_bounds(df, columns)
+
+    for col in columns:
+        values = df[col].to_numpy()
+        high = values > upper[col]
+        low = values < lower[col]
+        # only touch the columns with outliers, so that int columns without outliers keep their dtype (like the loop)
+        if (high.any() or low.any()) and df[col].dtype.kind in 'iu':
+            df[col] = df[col].astype('float64')  # the bounds are floats: the loop upcast the column too
+        if high.any():
+            df.loc[high, col] = upper[col]
+        if low.any():
+            df.loc[low, col] = lower[col]
+    return df
+
+
+# ---------------------PIPELINES----------------------#
+
+def preprocess_listings(data):
+    """
+    Steps of 1_Preprocessing_EDA.ipynb: from listings.csv.gz to the dataframe saved as outputs/airbnb_limpio.csv.
+    """
+    df = data[LISTINGS_COLUMNS].copy()
+    df['price'] = repair_price(df['price'])
+    df['host_response_rate'] = repair_percentage(df['host_response_rate'])
+    df['host_acceptance_rate'] = repair_percentage(df['host_acceptance_rate'])
+    # some nulls are '[]' instead of NaN
+    df = df.replace('[]', np.nan)
+    for col in MEAN_COLUMNS:
+        df[col] = df[col].fillna(df[col].mean())
+    for col in MEDIAN_COLUMNS:
+        df[col] = df[col].fillna(df[col].median()).astype(int)
+    return reparar_atipicos(df, ['price'])
+
+
+def preprocess_price_predictor(data):
+    """
+    Steps of 3_ML_pricepredictor.ipynb: from listings.csv.gz to the dataframe used to train the price model.
+    """
+    df = data[['beds'] + [col for col in LISTINGS_COLUMNS if col not in ('longitude', 'latitude', 'host_id')]].copy()
+    df['price'] = repair_price(df['price'])
+    df['host_response_rate'] = repair_percentage(df['host_response_rate'])
+    df['host_acceptance_rate'] = repair_percentage(df['host_acceptance_rate'])
+    df['bathrooms'] = repair_bathrooms(df['bathrooms_text'])
+    df = df.replace('[]', np.nan).drop(columns='bathrooms_text')
+    for col in MEAN_COLUMNS + ['bathrooms']:
+        df[col] = df[col].fillna(df[col].mean())
+    for col in MEDIAN_COLUMNS + ['beds']:
+        df[col] = df[col].fillna(df[col].median()).astype(int)
+    df = reparar_atipicos(df, ['price'])
+    df['bathrooms'] = df['bathrooms'].astype(int)
+    return df
@@ -0,0 +1,220 @@
+"""
+Sentiment scoring of the full reviews corpus with NLTK's VADER (see 2_NLP.ipynb).
+
+As in the notebook, the reviews are scored after preprocess_text() (lower case, no stopwords, lemmatised;
+see airbnb/text.py), so the scores are the same as the existing analysis. The reviews are split in batches and scored in a process pool (one SentimentIntensityAnalyzer per worker);
+the pos/neu/neg/compound scores are written straight into float32 arrays instead of going through a dict
+per row. Scores are cached by review id, so each new snapshot only scores the reviews that were not seen before.
+
+The Reviews page does not load the scores: it draws its charts from two small tables of sums by
+neighbourhood, room type and month (see build_tables()), that are rolled up to what each chart needs.
+
+    python -m airbnb.sentiment --city rome --snapshot 2023-12-15
+
+Needs the NLTK data of airbnb/text.py and the VADER lexicon: ``python -c "import nltk; nltk.download('vader_lexicon')"``.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from airbnb.text import preprocess_texts
+
+# scores of the preprocessed reviews (the raw-text scores of earlier versions were in scores.parquet and are not reused)
+SCORES_PATH = "cache/sentiment/preprocessed_scores.parquet"
+TABLES_DIR = "cache/sentiment/tables"
+SCORES = ['pos', 'neu', 'neg', 'compound']
+BATCH_SIZE = 2_000
+# the compound score (-1 to 1) is stored as a histogram of COMPOUND_BINS bins, as in the polarity chart of the notebook
+COMPOUND_BINS = 100
+GROUPS = ['neighbourhood_cleansed', 'room_type', 'month']
+
+_analyzer = None
+
+
+def _init_analyzer():
+    """
+    Create the analyzer of this process (once).
+    """
+    global _analyzer
+    if _analyzer is None:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+
+
+def score_batch(texts):
+    """
+    VADER scores of ``texts`` as a float32 array of shape (n, 4): pos, neu, neg, compound.
+    """
+    _init_analyzer()
+    scores = np.empty((len(texts), len(SCORES)), dtype='float32')
+    for i, text in enumerate(texts):
+        polarity = _analyzer.polarity_scores(text)
+        scores[i] = polarity['pos'], polarity['neu'], polarity['neg'], polarity['compound']
+    return scores
+
+
+def score_texts(texts, workers=None, batch_size=BATCH_SIZE):
+    """
+    Score a list of texts, in parallel over ``workers`` processes (all the cores by default; 1 = in this process).
+    """
+    texts = list(texts)
+    workers = workers or os.cpu_count()
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    if workers == 1 or len(batches) <= 1:
+        results = map(score_batch, batches)
+        return np.concatenate(list(results)) if batches else np.empty((0, len(SCORES)), dtype='float32')
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_analyzer) as pool:
+        return np.concatenate(list(pool.map(score_batch, batches)))
+
+
+def load_scores(scores_path=SCORES_PATH):
+    """
+    Cached scores (review id + SCORES), empty if nothing has been scored yet.
+    """
+    if os.path.exists(scores_path):
+        return pd.read_parquet(scores_path)
+    return pd.DataFrame({'id': pd.Series(dtype='int64'), **{s: pd.Series(dtype='float32') for s in SCORES}})
+
+
+def score_reviews(reviews, workers=None, batch_size=BATCH_SIZE, scores_path=SCORES_PATH, text_column='comments'):
+    """
+    Sentiment of every review of ``reviews`` (a dataframe with ``id`` and ``text_column``), preprocessed as in the notebook.
+    Only the reviews that are not in the cache are scored; the cache is updated with them.
+    Returns ``reviews`` with the SCORES columns (NaN for reviews without text).
+    """
+    cached = load_scores(scores_path)
+    new = reviews.loc[~reviews['id'].isin(cached['id']) & reviews[text_column].notna(), ['id', text_column]]
+    new = new.drop_duplicates('id')
+
+    if len(new):
+        texts = preprocess_texts(new[text_column].tolist(), workers)
+        scores = score_texts(texts, workers, batch_size)
+        scored = pd.DataFrame(scores, columns=SCORES)
+        scored.insert(0, 'id', new['id'].to_numpy())
+        cached = pd.concat([cached, scored], ignore_index=True) if len(cached) else scored
+        os.makedirs(os.path.dirname(scores_path) or '.', exist_ok=True)
+        tmp_path = scores_path + '.tmp'
+        cached.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, scores_path)
+
+    return reviews.merge(cached, on='id', how='left')
+
+
+# ---------------------SENTIMENT TABLES----------------------#
+
+def build_tables(scored, listings):
+    """
+    Precomputed tables of the Reviews page, from the scored reviews (``listing_id``, ``date`` and SCORES)
+    and the listings (``id``, ``neighbourhood_cleansed``, ``room_type``). Returns a dict with:
+
+    - ``summary``: number of reviews and sum of each score by GROUPS
+    - ``histogram``: number of reviews by GROUPS and compound bin
+
+    Counts, means and the compound histogram of any selection of neighbourhoods, room types and months
+    are sums of their rows.
+    """
+    listings = listings[['id', 'neighbourhood_cleansed', 'room_type']].rename(columns={'id': 'listing_id'})
+    df = scored.dropna(subset=['compound']).merge(listings, on='listing_id', how='left')
+    df[['neighbourhood_cleansed', 'room_type']] = df[['neighbourhood_cleansed', 'room_type']].fillna('Unknown')
+    df['month'] = df['date'].dt.to_period('M').dt.to_timestamp()
+    bins = np.floor((df['compound'].to_numpy('float64') + 1) / 2 * COMPOUND_BINS)
+    df['compound_bin'] = np.clip(bins, 0, COMPOUND_BINS - 1).astype('int16')
+    categories = {'neighbourhood_cleansed': 'category', 'room_type': 'category'}
+
+    grouped = df.groupby(GROUPS, observed=True)
+    summary = grouped.size().to_frame('count').astype('int32')
+    for score in SCORES:
+        summary[f'{score}_sum'] = grouped[score].sum().astype('float64')
+    histogram = df.groupby(GROUPS + ['compound_bin'], observed=True).size().astype('int32')
+    return {
+        'summary': summary.reset_index().astype(categories),
+        'histogram': histogram.rename('count').reset_index().astype(categories),
+    }
+
+
+def save_tables(tables, tables_dir=TABLES_DIR):
+    os.makedirs(tables_dir, exist_ok=True)
+    for name, table in tables.items():
+        path = os.path.join(tables_dir, f"{name}.parquet")
+        table.to_parquet(path + '.tmp', index=False, compression='zstd')
+        os.replace(path + '.tmp', path)
+
+
+def load_tables(tables_dir=TABLES_DIR):
+    """
+    Sentiment tables (see build_tables()), or None if they have not been built.
+    """
+    paths = {name: os.path.join(tables_dir, f"{name}.parquet") for name in ('summary', 'histogram')}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {name: pd.read_parquet(path) for name, path in paths.items()}
+
+
+def tables_version(tables_dir=TABLES_DIR):
+    """
+    Identifier of the current sentiment tables (None if there are none), to use as a cache key.
+    """
+    path = os.path.join(tables_dir, "summary.parquet")
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def filter_table(table, neighbourhoods=None, room_types=None, start=None, end=None):
+    """
+    Rows of a sentiment table of the selected neighbourhoods, room types and months (None = no filter).
+    """
+    mask = np.ones(len(table), dtype=bool)
+    if neighbourhoods:
+        mask &= table['neighbourhood_cleansed'].isin(neighbourhoods).to_numpy()
+    if room_types:
+        mask &= table['room_type'].isin(room_types).to_numpy()
+    if start is not None:
+        mask &= (table['month'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (table['month'] <= pd.Timestamp(end)).to_numpy()
+    return table[mask]
+
+
+def summarize(table, by):
+    """
+    Number of reviews, sum and mean of each score by ``by`` (a column of the summary table).
+    """
+    totals = table.groupby(by, observed=True)[['count'] + [f'{score}_sum' for score in SCORES]].sum()
+    for score in SCORES:
+        totals[score] = totals[f'{score}_sum'] / totals['count']
+    return totals.reset_index()
+
+
+def compound_histogram(table):
+    """
+    Number of reviews in each compound bin of the histogram table, with the bin centers (all the bins, also the empty ones).
+    """
+    counts = table.groupby('compound_bin')['count'].sum().reindex(range(COMPOUND_BINS), fill_value=0)
+    width = 2 / COMPOUND_BINS
+    return pd.DataFrame({'compound': -1 + width * (counts.index + 0.5), 'count': counts.to_numpy()})
+
+
+if __name__ == "__main__":
+    from airbnb.ingest import read_cache
+
+    parser = argparse.ArgumentParser(description="Score the sentiment of the cached reviews (see airbnb/ingest.py) "
+                                                 "and build the table of the Reviews page.")
+    parser.add_argument('--city')
+    parser.add_argument('--snapshot')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    filters = [(key, '=', value) for key, value in (('city', args.city), ('snapshot', args.snapshot)) if value]
+    # the same review (and listing) is in every later snapshot: keep one copy
+    reviews = read_cache('reviews', ['id', 'listing_id', 'date', 'comments'], filters or None).drop_duplicates('id', keep='last')
+    listings = read_cache('listings', ['id', 'neighbourhood_cleansed', 'room_type'], filters or None).drop_duplicates('id', keep='last')
+    before = len(load_scores())
+    result = score_reviews(reviews, args.workers)
+    print(f"{len(result)} reviews, {len(load_scores()) - before} newly scored")
+    tables = build_tables(result, listings)
+    save_tables(tables)
+    print(', '.join(f"{name}: {len(table)} rows" for name, table in tables.items()))
@@ -0,0 +1,120 @@
+"""
+Columnar, typed copy of the cleaned listings.
+
+1_Preprocessing_EDA.ipynb saves the working dataframe to ``outputs/airbnb_limpio.csv``.
+Parsing that CSV on every cold start is slow and keeps the repeated strings as object
+columns, so we convert it once to Parquet with an explicit schema:
+
+- categoricals for the string dimensions (neighbourhood, property type, room type...)
+- nullable booleans for the 't'/'f' flags
+- narrow ints and floats for the numeric columns
+
+Build (or rebuild) the store after running the notebook:
+
+    python -m airbnb.store
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CSV_PATH = "outputs/airbnb_limpio.csv"
+STORE_PATH = "outputs/airbnb_limpio.parquet"
+
+# ---------------------SCHEMA----------------------#
+
+# string dimensions with few distinct values
+CATEGORICAL_COLUMNS = ['host_location', 'neighbourhood_cleansed', 'property_type', 'room_type', 'bathrooms_text']
+# 't'/'f' flags (they can have nulls, so we use the nullable boolean dtype)
+BOOLEAN_COLUMNS = ['host_is_superhost', 'host_has_profile_pic']
+DATE_COLUMNS = ['host_since']
+# narrow numeric dtypes. The price stays in float64 so that the means shown in the app do not change.
+NUMERIC_DTYPES = {
+    'host_id': 'int64',
+    'host_listings_count': 'int32',
+    'accommodates': 'int8',
+    'availability_30': 'int8',
+    'availability_60': 'int8',
+    'availability_90': 'int8',
+    'number_of_reviews': 'int32',
+    'longitude': 'float32',
+    'latitude': 'float32',
+    'host_response_rate': 'float32',
+    'host_acceptance_rate': 'float32',
+    'price': 'float64',
+    'review_scores_rating': 'float32',
+    'review_scores_location': 'float32',
+    'reviews_per_month': 'float32',
+}
+
+
+def cast_listings(df):
+    """
+    Apply the store schema to a dataframe read from the cleaned CSV.
+    Columns that are not in the schema are left as they are.
+    """
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    for col in BOOLEAN_COLUMNS:
+        if col in df and df[col].dtype != 'boolean':
+            df[col] = df[col].map({'t': True, 'f': False, True: True, False: False}).astype('boolean')
+    for col in DATE_COLUMNS:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+# ---------------------BUILD----------------------#
+
+def build_store(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """
+    Convert the cleaned listings CSV into the typed Parquet store. Returns the written path.
+    """
+    df = cast_listings(pd.read_csv(csv_path))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, store_path, compression='zstd')
+    return store_path
+
+
+# ---------------------READ----------------------#
+
+def _pandas_types(arrow_type):
+    # keep nullable booleans as 'boolean' instead of falling back to object
+    if arrow_type == pa.bool_():
+        return pd.BooleanDtype()
+    return None
+
+
+def read_listings(columns=None, store_path=STORE_PATH, csv_path=CSV_PATH):
+    """
+    Read the listings with the store schema, only loading ``columns`` (all of them if None).
+
+    The Parquet file is memory-mapped. If it has not been built yet, the CSV is parsed
+    and cast instead, so the app keeps working (only slower).
+    """
+    columns = list(columns) if columns is not None else None
+    if os.path.exists(store_path):
+        table = pq.read_table(store_path, columns=columns, memory_map=True)
+        return table.to_pandas(types_mapper=_pandas_types)
+    return cast_listings(pd.read_csv(csv_path, usecols=columns))
+
+
+def dataset_version(store_path=STORE_PATH, csv_path=CSV_PATH):
+    """
+    Identifier of the listings file currently in use. It changes whenever the store (or the CSV) is rebuilt,
+    so it can be used as a cache key for everything derived from the listings.
+    """
+    path = store_path if os.path.exists(store_path) else csv_path
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+if __name__ == "__main__":
+    path = build_store()
+    print(f"Listings store written to {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
@@ -0,0 +1,97 @@
+"""
+Text preprocessing of the reviews (``preprocess_text`` of 2_NLP.ipynb): tokenise, drop the English stopwords, lemmatise.
+
+The output is the same as the notebook function, but the stopwords are a set built once (the notebook rebuilt
+the list for every token), there is a single lemmatizer and the lemmas are memoised (the vocabulary of the reviews
+is small compared with the number of tokens). Large corpora are streamed in chunks and can be spread over a process pool.
+
+Needs the NLTK data: ``python -c "import nltk; [nltk.download(p) for p in ('punkt_tab', 'stopwords', 'wordnet')]"``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+CHUNK_SIZE = 5_000
+LEMMA_CACHE_SIZE = 500_000
+
+_lemmatizer = None
+
+
+@lru_cache()
+def stop_words(languages=('english',)):
+    """
+    NLTK stopwords of ``languages``, as a set (built once per process).
+    """
+    from nltk.corpus import stopwords
+    return frozenset(word for language in languages for word in stopwords.words(language))
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token):
+    """
+    WordNet lemma of ``token`` (memoised).
+    """
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer.lemmatize(token)
+
+
+def tokens(text):
+    """
+    Lower-cased tokens of ``text`` without stopwords, lemmatised.
+    """
+    from nltk.tokenize import word_tokenize
+    stop = stop_words()
+    return [lemmatize(token) for token in word_tokenize(text.lower()) if token not in stop]
+
+
+def preprocess_text(text):
+    """
+    Same as ``preprocess_text`` of 2_NLP.ipynb: the tokens of ``tokens()`` joined with spaces.
+    """
+    return ' '.join(tokens(text))
+
+
+def _preprocess_chunk(texts):
+    return [preprocess_text(text) for text in texts]
+
+
+def _chunks(texts, chunk_size):
+    texts = iter(texts)
+    while chunk := list(islice(texts, chunk_size)):
+        yield chunk
+
+
+def iter_preprocess(texts, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Preprocess an iterable of texts, yielding the results in order.
+
+    ``texts`` is consumed in chunks of ``chunk_size``, so it can be a generator over millions of reviews.
+    With ``workers`` > 1 (None = all the cores) the chunks are processed in a process pool,
+    with at most two chunks per worker in flight.
+    """
+    workers = workers or os.cpu_count()
+    chunks = _chunks(texts, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from _preprocess_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_preprocess_chunk, chunk) for chunk in islice(chunks, 2 * workers)]
+        while pending:
+            done = pending.pop(0)
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(pool.submit(_preprocess_chunk, next_chunk))
+            yield from done.result()
+
+
+def preprocess_texts(texts, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    List of the preprocessed texts (in parallel over all the cores by default).
+    """
+    return list(iter_preprocess(texts, workers, chunk_size))
@@ -0,0 +1,58 @@
+"""
+Tiled point clustering for the listings map.
+
+Instead of sending every coordinate to the browser (FastMarkerCluster), we precompute clusters
+for each zoom level on a Web Mercator grid: every map tile (256 px) is divided in CELLS_PER_TILE x CELLS_PER_TILE
+cells and the listings of each cell are merged into one cluster (count + mean position).
+The map then asks only for the clusters of the visible area at its current zoom, so the payload depends
+on the size of the screen and not on the number of listings.
+"""
+import numpy as np
+import pandas as pd
+
+MIN_ZOOM = 8
+MAX_ZOOM = 18
+CELLS_PER_TILE = 4  # 64 px cells
+
+
+def _mercator(lat, lon):
+    """
+    Normalised Web Mercator coordinates (0-1) of the points, as used by map tiles.
+    """
+    lat = np.radians(np.clip(np.asarray(lat, dtype='float64'), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype='float64') + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return x, y
+
+
+def build_index(lat, lon, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Precompute the clusters of every zoom level.
+    Returns {zoom: dataframe with cell_x, cell_y, count, latitude, longitude}.
+    """
+    x, y = _mercator(lat, lon)
+    points = pd.DataFrame({'latitude': np.asarray(lat, dtype='float64'), 'longitude': np.asarray(lon, dtype='float64')})
+    index = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        cells = 2 ** zoom * CELLS_PER_TILE
+        points['cell_x'] = (x * cells).astype('int64')
+        points['cell_y'] = (y * cells).astype('int64')
+        clusters = points.groupby(['cell_x', 'cell_y']).agg(count=('latitude', 'size'),
+                                                           latitude=('latitude', 'mean'),
+                                                           longitude=('longitude', 'mean'))
+        index[zoom] = clusters.reset_index()
+    return index
+
+
+def query(index, zoom, south, west, north, east, padding=0.25):
+    """
+    Clusters of ``index`` for a map at ``zoom`` showing the given bounds.
+    The bounds are padded by ``padding`` (fraction of the view) so that small pans do not leave empty borders.
+    """
+    zoom = int(min(max(round(zoom), min(index)), max(index)))
+    pad_lat = (north - south) * padding
+    pad_lon = (east - west) * padding
+    clusters = index[zoom]
+    visible = (clusters['latitude'].between(south - pad_lat, north + pad_lat)
+               & clusters['longitude'].between(west - pad_lon, east + pad_lon))
+    return clusters[visible]
@@ -0,0 +1,209 @@
+"""
+Word-frequency index of the reviews, used to draw the word cloud of the Reviews page.
+
+2_NLP.ipynb joined every comment in a single string to build the cloud, which only worked for the first 10,000 reviews.
+Here the reviews are read in chunks and each chunk is reduced to term counts per listing; the counts of
+the chunks (computed in parallel if wanted) are merged by summing them. The index is a small table
+(listing_id, term, count) saved per snapshot, next to the ids of the reviews it already counts,
+so new reviews are added without counting the old ones again:
+
+    cache/wordfreq/city=<city>/snapshot=<date>/terms.parquet
+    cache/wordfreq/city=<city>/snapshot=<date>/reviews.parquet
+
+The terms follow the notebook: lower case, words of 3 or more characters, without the English and Spanish stopwords.
+
+    python -m airbnb.wordfreq --city rome --snapshot 2023-12-15 [--image img/nube_airbnb.png]
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from airbnb.ingest import CACHE_DIR, read_cache
+from airbnb.text import stop_words
+
+INDEX_DIR = os.path.join(CACHE_DIR, "wordfreq")
+TERMS_FILE = "terms.parquet"
+REVIEWS_FILE = "reviews.parquet"
+CHUNK_SIZE = 50_000
+STOPWORD_LANGUAGES = ('english', 'spanish')
+# words are runs of letters; the notebook removed the words of 1 or 2 characters
+SEPARATOR_PATTERN = r"[^\p{L}]+"
+MIN_LENGTH = 3
+COUNTS_SCHEMA = pa.schema([('listing_id', pa.int64()), ('term', pa.string()), ('count', pa.int64())])
+MASK_PATH = "img/home.jpg"
+
+
+# ---------------------COUNTING----------------------#
+
+def count_terms(reviews, text_column='comments'):
+    """
+    Term counts of ``reviews`` (a dataframe with ``listing_id`` and ``text_column``), as (listing_id, term, count).
+
+    The split, the filters and the count run on Arrow arrays, without a Python object per word.
+    """
+    text = pa.array(reviews[text_column], type=pa.string())
+    words = pc.split_pattern_regex(pc.utf8_lower(text), SEPARATOR_PATTERN)
+    terms = pc.list_flatten(words)
+    listing_ids = pc.take(pa.array(reviews['listing_id'].to_numpy()), pc.list_parent_indices(words))
+    stop = pa.array(sorted(stop_words(STOPWORD_LANGUAGES)), type=pa.string())
+    keep = pc.and_(pc.greater_equal(pc.utf8_length(terms), MIN_LENGTH), pc.invert(pc.is_in(terms, value_set=stop)))
+    table = pa.table({'listing_id': listing_ids, 'term': terms}).filter(keep)
+    counts = table.group_by(['listing_id', 'term']).aggregate([([], 'count_all')])
+    return counts.rename_columns(['listing_id', 'term', 'count']).to_pandas()
+
+
+def merge_counts(counts):
+    """
+    Merge (sum) a list of (listing_id, term, count) tables.
+    """
+    counts = [c for c in counts if len(c)]
+    if not counts:
+        return pd.DataFrame({'listing_id': pd.Series(dtype='int64'), 'term': pd.Series(dtype='string'),
+                             'count': pd.Series(dtype='int64')})
+    if len(counts) == 1:
+        return counts[0]
+    tables = [pa.Table.from_pandas(c.astype({'term': 'string'}), schema=COUNTS_SCHEMA, preserve_index=False) for c in counts]
+    merged = pa.concat_tables(tables).group_by(['listing_id', 'term']).aggregate([('count', 'sum')])
+    return merged.rename_columns(['listing_id', 'term', 'count']).to_pandas()
+
+
+def build_counts(reviews, workers=1, chunk_size=CHUNK_SIZE, text_column='comments'):
+    """
+    Term counts of ``reviews``, counted by chunks (in a process pool if ``workers`` > 1, None = all the cores).
+    """
+    workers = workers or os.cpu_count()
+    chunks = [reviews.iloc[start:start + chunk_size][['listing_id', text_column]]
+              for start in range(0, len(reviews), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return merge_counts([count_terms(chunk, text_column) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_counts(list(pool.map(count_terms, chunks, [text_column] * len(chunks))))
+
+
+# ---------------------INDEX----------------------#
+
+def snapshot_dir(city, snapshot, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"city={city}", f"snapshot={snapshot}")
+
+
+def _write_parquet(df, path):
+    # write and swap, so a reader never sees a half-written file
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def load_index(city, snapshot, index_dir=INDEX_DIR):
+    """
+    Term counts (listing_id, term, count) of a snapshot, empty if it has not been indexed.
+    """
+    path = os.path.join(snapshot_dir(city, snapshot, index_dir), TERMS_FILE)
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    return merge_counts([])
+
+
+def update_index(reviews, city, snapshot, index_dir=INDEX_DIR, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Add the reviews (``id``, ``listing_id``, ``comments``) that are not in the index of the snapshot yet.
+    Returns the number of reviews added.
+    """
+    out_dir = snapshot_dir(city, snapshot, index_dir)
+    seen_path = os.path.join(out_dir, REVIEWS_FILE)
+    seen = pd.read_parquet(seen_path)['id'] if os.path.exists(seen_path) else pd.Series(dtype='int64')
+    new = reviews[~reviews['id'].isin(seen)].drop_duplicates('id')
+    if not len(new):
+        return 0
+
+    counts = merge_counts([load_index(city, snapshot, index_dir), build_counts(new, workers, chunk_size)])
+    os.makedirs(out_dir, exist_ok=True)
+    # the terms are written as a dictionary column: each distinct word is stored once
+    _write_parquet(counts.astype({'term': 'category'}), os.path.join(out_dir, TERMS_FILE))
+    _write_parquet(pd.DataFrame({'id': pd.concat([seen, new['id']], ignore_index=True)}), seen_path)
+    return len(new)
+
+
+def index_version(city, snapshot, index_dir=INDEX_DIR):
+    """
+    Identifier of the current index of a snapshot (it changes when new reviews are added), to use as a cache key.
+    """
+    stat = os.stat(os.path.join(snapshot_dir(city, snapshot, index_dir), TERMS_FILE))
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def snapshots(index_dir=INDEX_DIR):
+    """
+    (city, snapshot) pairs that have an index, sorted by snapshot date.
+    """
+    found = []
+    for path in glob.glob(os.path.join(index_dir, 'city=*', 'snapshot=*', TERMS_FILE)):
+        folder = os.path.dirname(path)
+        city = os.path.basename(os.path.dirname(folder)).split('=', 1)[1]
+        found.append((city, os.path.basename(folder).split('=', 1)[1]))
+    return sorted(found, key=lambda pair: pair[1])
+
+
+def frequencies(index, listing_ids=None, top=200):
+    """
+    {term: count} of the ``top`` most frequent terms, over all the listings or only ``listing_ids``.
+    """
+    if listing_ids is not None:
+        index = index[index['listing_id'].isin(listing_ids)]
+    totals = index.groupby('term', observed=True)['count'].sum()
+    return totals.nlargest(top).to_dict()
+
+
+def neighbourhood_listings(city, snapshot, cache_dir=CACHE_DIR):
+    """
+    {neighbourhood: listing ids} of a snapshot, from the cached listings (see airbnb/ingest.py).
+    Empty if the listings have not been ingested.
+    """
+    if not os.path.isdir(os.path.join(cache_dir, 'listings')):
+        return {}
+    listings = read_cache('listings', ['id', 'neighbourhood_cleansed'],
+                          [('city', '=', city), ('snapshot', '=', snapshot)], cache_dir)
+    return listings.groupby('neighbourhood_cleansed')['id'].apply(list).to_dict()
+
+
+# ---------------------WORD CLOUD----------------------#
+
+def word_cloud(frequencies, mask_path=MASK_PATH, width=800, height=400):
+    """
+    Word cloud image (a PIL image) of ``frequencies``, with the house mask of the notebook.
+    None if there are no words (e.g. a neighbourhood without reviews): WordCloud cannot draw an empty cloud.
+    """
+    if not frequencies:
+        return None
+    import numpy as np
+    from PIL import Image
+    from wordcloud import WordCloud
+
+    mask = None
+    if mask_path:
+        mask = np.array(Image.open(mask_path))
+        mask[mask == 1] = 255
+    cloud = WordCloud(width=width, height=height, background_color='white', mask=mask)
+    return cloud.generate_from_frequencies(frequencies).to_image()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the word-frequency index of the cached reviews (see airbnb/ingest.py).")
+    parser.add_argument('--city', required=True)
+    parser.add_argument('--snapshot', required=True)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--image', help='also draw the word cloud of the whole snapshot to this file')
+    args = parser.parse_args()
+    reviews = read_cache('reviews', ['id', 'listing_id', 'comments'], [('city', '=', args.city), ('snapshot', '=', args.snapshot)])
+    added = update_index(reviews, args.city, args.snapshot, workers=args.workers)
+    index = load_index(args.city, args.snapshot)
+    print(f"{added} reviews added, {index['term'].nunique()} terms")
+    if args.image:
+        cloud = word_cloud(frequencies(index))
+        if cloud is None:
+            print("No words to draw, the image was not saved")
+        else:
+            cloud.save(args.image)
@@ -6,21 +6,23 @@ import numpy as np
 import pandas as pd
 import warnings
 import base64
+import time
+import os
 from pandas.errors import SettingWithCopyWarning
-# Graphics
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly_express as px
-from plotly.subplots import make_subplots
-# interactive maps
-import folium
-from folium.plugins import FastMarkerCluster
-from streamlit_folium import folium_static
+# Graphics and interactive maps are imported only by the pages that use them (see below)
+# listings store
+from airbnb.store import read_listings, dataset_version
+from airbnb.aggregates import COLUMNS as AGGREGATE_COLUMNS, build_aggregates, rollup
+from airbnb.tiles import build_index, query
+from airbnb.artifacts import read_html
+from airbnb.assets import asset_url
+from airbnb.correlation import CORR_COLUMNS, build_ranks, render_heatmap, spearman
+from airbnb import wordfreq
+from airbnb import sentiment
+# instrumentation
+from airbnb.metrics import metrics
 # prediction
-import xgboost as xgb
-import json
-from joblib import load
-from pycaret.regression import load_model
+from airbnb.models import WARM_UP_ENV, registry
 
 
 warnings.simplefilter(action='ignore', category=(SettingWithCopyWarning))
@@ -34,10 +36,31 @@ st.set_page_config(
     initial_sidebar_state="collapsed", 
 )
 
+# ---------------------INSTRUMENTATION----------------------#
+# timings, cache counters and memory of each rerun (see airbnb/metrics.py).
+# The totals are served as Prometheus text if AIRBNB_METRICS_PORT is set (one endpoint per process).
+metrics.serve()
+metrics.begin_rerun()
+
+# the price predictor (xgboost and the precomputed predictions) is loaded in the background when its page is opened;
+# AIRBNB_MODEL_WARM_UP=1 loads it when the app starts instead, so the first prediction never waits for it
+if os.environ.get(WARM_UP_ENV, '') not in ('', '0'):
+    registry.warm_up_in_background()
+
 # # ---------------------MENU----------------------# 
 
+# static image (see airbnb/assets.py), or the original file if the static assets have not been built
+def show_image(image_file, width=None):
+    url = asset_url(image_file, width)
+    if url is None:
+        st.image(image_file)
+    else:
+        max_width = f" max-width: {width}px;" if width else ""
+        st.markdown(f'<img src="{url}" style="width: 100%;{max_width} display: block; margin: auto;">', unsafe_allow_html=True)
+
 #header image
-st.image("img/mask.png")
+metrics.section("header")
+show_image("img/mask.png")
 
 page = option_menu(None, ["Home", "Neighbourhoods", "Other information", "Power BI dashboard", "Reviews", "Price predictor"], 
     icons=["house", "pin-map", "plus", "clipboard-plus", "table", "coin"], 
@@ -47,40 +70,112 @@ page = option_menu(None, ["Home", "Neighbourhoods", "Other information", "Power
         "icon": {"margin": "auto", "display": "block"}  # Centered icons
     }
 )
+metrics.set_page(page)
 
 # ---------------------LOAD DATA----------------------#
 
-# read data
-@st.cache_data()
-def load_data():
-    df = pd.read_csv("outputs/airbnb_limpio.csv")
+# columns needed by each page (None = all columns). Pages that are not listed do not use the listings.
+PAGE_COLUMNS = {
+    "Home": None,
+    "Neighbourhoods": ['latitude', 'longitude'],
+    "Other information": ['host_id', 'host_is_superhost', 'host_listings_count'],
+}
+
+# read data from the typed, memory-mapped listings store (see airbnb/store.py).
+# The dataset version is part of the cache key, so everything is recomputed when the store is rebuilt.
+@metrics.cached(st.cache_data())
+def load_data(columns=None, version=None):
+    df = read_listings(columns)
     return df
 
+# counts and means shared by all the charts (see airbnb/aggregates.py)
+@metrics.cached(st.cache_data())
+def load_aggregates(version=None):
+    return build_aggregates(read_listings(AGGREGATE_COLUMNS))
+
+# clusters of listings for each zoom level of the map (see airbnb/tiles.py)
+@metrics.cached(st.cache_data())
+def load_map_index(version=None):
+    listings = read_listings(['latitude', 'longitude'])
+    return build_index(listings['latitude'], listings['longitude'])
+
+# ranks of the columns of the correlation heatmap (see airbnb/correlation.py)
+@metrics.cached(st.cache_data())
+def load_correlation_ranks(version=None):
+    listings = read_listings(CORR_COLUMNS + ['neighbourhood_cleansed'])
+    return build_ranks(listings), listings['neighbourhood_cleansed'].to_numpy()
+
+# Spearman matrix and heatmap of a neighbourhood (None = all the listings), from the cached ranks
+@metrics.cached(st.cache_data())
+def load_correlation(neighbourhood=None, version=None):
+    ranks, neighbourhoods = load_correlation_ranks(version)
+    rows = None if neighbourhood is None else neighbourhoods == neighbourhood
+    corr = spearman(ranks, rows)
+    return corr, render_heatmap(corr)
+
+# word-frequency index of the reviews and listings of each neighbourhood (see airbnb/wordfreq.py).
+# Read-only and large: one copy shared by all the sessions instead of unpickling it on every rerun.
+@metrics.cached(st.cache_resource())
+def load_word_index(city, snapshot, version=None):
+    return wordfreq.load_index(city, snapshot), wordfreq.neighbourhood_listings(city, snapshot)
+
+# word cloud of a neighbourhood (None = all), drawn from the index instead of the raw reviews
+@metrics.cached(st.cache_data())
+def load_word_cloud(city, snapshot, neighbourhood=None, version=None):
+    index, neighbourhoods = load_word_index(city, snapshot, version)
+    listing_ids = neighbourhoods.get(neighbourhood) if neighbourhood else None
+    return wordfreq.word_cloud(wordfreq.frequencies(index, listing_ids))
+
+# sentiment of the reviews by neighbourhood, room type and month (see airbnb/sentiment.py)
+@metrics.cached(st.cache_data())
+def load_sentiment_tables(version=None):
+    return sentiment.load_tables()
+
 # load data
-df = load_data()
+metrics.section("load data")
+version = dataset_version()
+if page in PAGE_COLUMNS:
+    df = load_data(PAGE_COLUMNS[page], version)
+if page in ["Neighbourhoods", "Other information"]:
+    aggs = load_aggregates(version)
 
 # ---------------------BACKGROUND IMAGE----------------------#
 
-def add_bg_from_local(image_file):
+# base64 of the image, only used if the static assets have not been built (encoded once per process)
+@metrics.cached(st.cache_resource())
+def encode_image(image_file):
     with open(image_file, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read())
+        return base64.b64encode(image_file.read()).decode()
+
+def add_bg_from_local(image_file):
+    # the page only carries the URL of the WebP variants (see airbnb/assets.py); the browser downloads and caches them
+    large, small = asset_url(image_file), asset_url(image_file, 1024)
+    if large is None:
+        large = small = f"data:image/png;base64,{encode_image(image_file)}"
     st.markdown(
     f"""
      <style>
         .stApp {{
-        background-image: url(data:image/{"png"};base64,{encoded_string.decode()});
+        background-image: url({large});
         background-size: cover
+    }}
+        @media (max-width: 1024px) {{
+        .stApp {{
+        background-image: url({small});
+    }}
     }}
     </style>
     """,
     unsafe_allow_html=True
     )
+metrics.section("background")
 add_bg_from_local("img/rome_background.png")  
 
 # ---------------------BODY----------------------#
 
 # PAGE 1-------------------------------------
 if page == "Home":
+    metrics.section("Home")
     
     st.markdown("""
                 ***Rome, the Eternal City, has been a crossroads of cultures and religions for more than two millennia.
@@ -129,26 +224,50 @@ if page == "Home":
 
 # PAGE 2-------------------------------------
 elif page == "Neighbourhoods":
+    metrics.section("Neighbourhoods/map")
+    # Graphics
+    import plotly_express as px
+    # interactive maps
+    import folium
+    from streamlit_folium import st_folium
 
     st.markdown('Here you can see the different accommodations on offer and where they are located. Zoom in on the map to see more:')
-    latitud = df['latitude'].tolist()
-    longitud = df['longitude'].tolist()
-    coordinates = list(zip(latitud,longitud))
     # define the initial location of the map
     latitud_1 = df['latitude'].iloc[0]
     longitud_1 = df['longitude'].iloc[0]
+    # current view of the map (zoom and bounds sent back by st_folium). At the beginning, all the listings.
+    view = st.session_state.get('map_view') or {
+        'zoom': 10,
+        'bounds': {'_southWest': {'lat': df['latitude'].min(), 'lng': df['longitude'].min()},
+                   '_northEast': {'lat': df['latitude'].max(), 'lng': df['longitude'].max()}}}
+    south_west, north_east = view['bounds']['_southWest'], view['bounds']['_northEast']
+    # only the precomputed clusters of the visible area are sent to the browser
+    clusters = query(load_map_index(version), view['zoom'], south_west['lat'], south_west['lng'], north_east['lat'], north_east['lng'])
+    listings_layer = folium.FeatureGroup(name='Listings')
+    for cluster in clusters.itertuples():
+        folium.CircleMarker(location=[cluster.latitude, cluster.longitude], radius=4 + 2 * np.log2(cluster.count),
+                            color='#922B21', fill=True, fill_opacity=0.6, weight=1,
+                            tooltip=f'{cluster.count} listings').add_to(listings_layer)
     # create the Folium map with the specified starting location
     map = folium.Map(location = [latitud_1,longitud_1],zoom_start=10)
-    # Adding locations to the generated Folium map
-    FastMarkerCluster(data=coordinates).add_to(map) # It is used to group the closest markers into clusters.
     folium.Marker(location=[latitud_1,longitud_1]).add_to(map)
-    folium_static(map) 
+    # the clusters are added as a dynamic layer, so panning/zooming does not reload the whole map
+    with metrics.span("st_folium"):
+        output = st_folium(map, feature_group_to_add=listings_layer, key='listings_map',
+                           returned_objects=['zoom', 'bounds'], width=700, height=500)
+    # when the user moves the map, store the new view and rerun to send the clusters of that view
+    new_view = {'zoom': output.get('zoom'), 'bounds': output.get('bounds')} if output else None
+    if new_view and new_view['zoom'] and new_view['bounds'] and new_view['bounds']['_southWest']['lat'] is not None \
+            and new_view != view:
+        st.session_state['map_view'] = new_view
+        st.rerun()
     
     st.markdown("""
             ### What would you like to know? Select a tab:              
         """)
 
     # ---------------------TABS (pestañas)----------------------#
+    metrics.section("Neighbourhoods/tabs")
     tab1, tab2, tab3, tab4 = st.tabs(
         ['Accomodations','Price', 'Score','Maps']) 
     with tab1:
@@ -158,7 +277,7 @@ elif page == "Neighbourhoods":
         st.markdown('### Neighbourhood VS No. of accommodations')
         st.write('First of all, we are interested in the distribution of accommodation in each neighbourhood. We can see that in the historic centre the number of accommodations or advertisements is much higher than in the other districts:')
             
-        accom_neigh = df['neighbourhood_cleansed'].value_counts().sort_values(ascending=True)
+        accom_neigh = rollup(aggs, 'neighbourhood_cleansed')['count'].sort_values(ascending=True)
             
         #Plotly bar chart
         fig = px.bar(accom_neigh, x=accom_neigh.values, y=accom_neigh.index,color=accom_neigh.values, color_continuous_scale='BrBG', text_auto = False) 
@@ -178,7 +297,7 @@ elif page == "Neighbourhoods":
         st.markdown('### Neighbourhood VS Average price')
         st.write('It would also be interesting to know the average price for each neighbourhood. As expected, staying in the historic centre is more expensive:')
             
-        neigh_price = df.groupby('neighbourhood_cleansed')['price'].mean().sort_values(ascending=True)
+        neigh_price = rollup(aggs, 'neighbourhood_cleansed')['price'].sort_values(ascending=True)
             
         #Plotly bar chart
         fig = px.bar(neigh_price,
@@ -201,7 +320,7 @@ elif page == "Neighbourhoods":
         
         st.markdown('**We will start by looking at the overall score:**')
         # General score
-        general_score_neigh = df.groupby('neighbourhood_cleansed')['review_scores_rating'].mean().sort_values().reset_index()
+        general_score_neigh = rollup(aggs, 'neighbourhood_cleansed')['review_scores_rating'].sort_values().reset_index()
         fig = px.bar(general_score_neigh, x='review_scores_rating', y='neighbourhood_cleansed', color='review_scores_rating', color_continuous_scale='tempo')
         fig.update_layout(height=500, width=690, title_text="Accommodation score by neighbourhood (0-5 ★)", title_x=0.23,xaxis_title='General score',yaxis_title='', coloraxis_colorbar_title='Score')  
         
@@ -212,7 +331,7 @@ elif page == "Neighbourhoods":
             
         st.markdown('**And now the localisation score:**')
         # Localisation score
-        loc_score_neigh = df.groupby('neighbourhood_cleansed')['review_scores_location'].mean().sort_values().reset_index()
+        loc_score_neigh = rollup(aggs, 'neighbourhood_cleansed')['review_scores_location'].sort_values().reset_index()
         fig = px.bar(loc_score_neigh, x='review_scores_location', y='neighbourhood_cleansed', color='review_scores_location', color_continuous_scale='tempo')
         fig.update_layout(height=500, width=690, title_text="Accommodation score by neighbourhood (0-5 ★)", title_x=0.23,xaxis_title='Localisation score',yaxis_title='',coloraxis_colorbar_title='Score')
         st.plotly_chart(fig)
@@ -223,26 +342,30 @@ elif page == "Neighbourhoods":
         st.markdown('### INTERACTIVE MAPS') 
         st.write('Finally, we can analyse these 3 points by visualising them on interactive maps. There are two different layers, so you can decide whether you want to see the neighbourhoods by average price or by overall score:')
         
-        # Open html file with the information of the maps generated with folium in read mode.
-        HtmlFile = open("html/rome_map.html", 'r', encoding='utf-8')
-        # Read and load into source_code variable
-        source_code = HtmlFile.read() 
-        print(source_code)
+        # html file with the maps generated with folium (read once per process, see airbnb/artifacts.py)
+        with metrics.span("read_html"):
+            source_code = read_html("html/rome_map.html")
         # view content on streamlit
         components.html(source_code, height = 600)
         
         
 # PAGE 3----------------------------------
 elif page == "Other information":
+        # Graphics
+        import seaborn as sns
+        from matplotlib.figure import Figure
+        import plotly_express as px
+        from plotly.subplots import make_subplots
     
     # --------------Most common accommodation
+        metrics.section("Other information/accommodation")
         
         st.markdown('### 1. Types of accommodation in Airbnb listings')
         st.write("""**Analysis of the number of properties for each type of space advertised on the platform.
                  The most frequent (+ 200 appearances) and the least frequent (less than 50) are displayed.**""")
         
         # Bar chart plotly of the most frequent accommodations
-        accom = df.groupby(['property_type', 'room_type']).size().reset_index(name='count') # size() calculates the size of each group (no. of room_type of each property_type group)
+        accom = rollup(aggs, ['property_type', 'room_type'])['count'].reset_index() # no. of room_type of each property_type group
         accom1 = accom[accom['count']>200].sort_values(by=['count']) 
         accom2 = accom[accom['count']<5].sort_values(by=['count'],ascending=False) 
         
@@ -276,10 +399,11 @@ elif page == "Other information":
         st.write('-----')
     
     # --------------No. of people staying
+        metrics.section("Other information/people")
         st.markdown('### 2. No. of people staying')
         st.write('You can see that the most common number is 2 people. The maximum is 16, which is the maximum allowed by Airbnb:')
         
-        Accomm = df['accommodates'].value_counts().sort_index()
+        Accomm = rollup(aggs, 'accommodates')['count'].sort_index()
 
         fig = px.bar(Accomm, x=Accomm.index, y=Accomm.values, color_discrete_sequence=['#16A085'])
         fig.update_layout(
@@ -294,12 +418,13 @@ elif page == "Other information":
     
     
     # --------------General score VS Price
+        metrics.section("Other information/score vs price")
 
         st.markdown('### 3. General score VS Price')
         st.write("""Let's look at the relationship between these 2 continuous variables. We see that the most expensive accommodations are not the ones with the best scores.
                  Surprisingly, the highest proportion of accommodations with good scores are below the average price:""")
-        score_price = df.groupby('review_scores_rating')['price'].mean().sort_values().reset_index()
-        mean_price = df['price'].mean().round(2)
+        score_price = aggs['by_score']
+        mean_price = round(aggs['mean_price'], 2)
         # scatter plot
         fig = px.scatter(score_price, y='price', x='review_scores_rating',opacity=0.7, labels={'price': 'Price', 'review_scores_rating': 'General score (0-5)'})
         fig.update_layout(height=500, width=695, title_text="Relationship between price and general accommodation score", title_x=0.2,xaxis_title="General score (0-5)", yaxis_title="Price",
@@ -312,6 +437,7 @@ elif page == "Other information":
         st.write('-----')
 
     # --------------top10 host
+        metrics.section("Other information/top10 host")
 
         st.markdown('## 4. Top10 host')
         st.markdown("Let's calculate the top 10 hosts with the highest number of listings:")
@@ -319,23 +445,25 @@ elif page == "Other information":
         top10_host=df['host_id'].value_counts().head(10)
         # Filter the original DataFrame to include only the rows of the top 10 hosts
         df_top10_host = df[df['host_id'].isin(top10_host.index)]
+        # the flag is missing for some hosts (NA in the store): count them as not superhost
+        df_top10_host = df_top10_host.assign(host_is_superhost=df_top10_host['host_is_superhost'].fillna(False).astype(bool))
         df_top10_host['host_listings_count'].sort_values()
         
-        st.set_option('deprecation.showPyplotGlobalUse', False) #remove the warning that I get in the graphic.
-
-        plt.figure(figsize=(8, 5))
+        # a Figure of its own instead of the global pyplot figure, which concurrent sessions would draw on at the same time
+        figure = Figure(figsize=(8, 5))
         sns.set_style("white") 
-        colors = {"f": '#16A085', "t": '#922B21'}
+        colors = {False: '#16A085', True: '#922B21'}
 
-        fig = sns.countplot(data=df_top10_host, y='host_id',hue='host_is_superhost',palette=colors)
+        fig = sns.countplot(data=df_top10_host, y='host_id',hue='host_is_superhost',palette=colors, ax=figure.subplots())
 
         fig.set_xlabel('Number of listings published', fontsize=10) 
         fig.set_ylabel('Host ID', fontsize=10) 
 
         fig.tick_params(axis='y', labelsize=10)
         fig.tick_params(axis='x', labelsize=10)
-        plt.legend(title='¿Superhost?', labels=['Yes', 'No'], fontsize=10)
-        st.pyplot()
+        fig.legend(title='¿Superhost?', labels=['Yes', 'No'], fontsize=10)
+        with metrics.span("seaborn render"):
+            st.pyplot(figure)
         
         st.markdown('We see that the host with the most ads is the number ``23532561``, with **265** ads. This is probably a company that is professionally involved in holiday rentals.')
         st.markdown('Of those 10, only 2 are **superhost**.')
@@ -343,7 +471,7 @@ elif page == "Other information":
         st.markdown('And in total what is the **host/superhost** ratio?')
         # Pie chart
         colors = ['#16A085', '#922B21']
-        fig = px.pie(values=df['host_is_superhost'].value_counts(), names=['No superhost','SUPERHOST'], color_discrete_sequence=colors, hole=0.3)
+        fig = px.pie(values=aggs['superhost'], names=['No superhost','SUPERHOST'], color_discrete_sequence=colors, hole=0.3)
         fig.update_layout(title='',width=700, height=500, showlegend=True,  title_x=0.5, template = 'plotly_white',legend=dict(
                 orientation='h',  # Horizontal orientation
                 y=-0.05,  # Vertical offset from the graph (0-1)
@@ -364,27 +492,14 @@ elif page == "Other information":
 - Maintained an overall rating of **4.8**.""")
         
         # --------------correlation
+        metrics.section("Other information/correlation")
         
         st.write('As we do not know the distribution of the variables, we will use the Spearman correlation:')
-        #replace categorical variables with numbers.
-        dict_profilepic = {'f':0,'t':1}
-        dict_superhost = {'f':0,'t':1}
-        df['host_has_profile_pic'] = df['host_has_profile_pic'].replace(dict_profilepic)
-        df['host_is_superhost'] = df['host_is_superhost'].replace(dict_superhost)
-        
         # Spearman's method (measures non-parametric and monotonic dependence between variables).
-        var = df[['host_response_rate','host_acceptance_rate','host_is_superhost','host_listings_count','host_has_profile_pic','accommodates','price', 'availability_30', 'availability_60', 'availability_90','number_of_reviews','review_scores_rating','review_scores_location','reviews_per_month']]
-        corr = var.corr(method='spearman',numeric_only=True) 
-        # Generate a mask for the upper triangle
-        mask = np.triu(np.ones_like(corr, dtype=bool)) 
-        # Set up the matplotlib figure
-        f, ax = plt.subplots(figsize=(15,13))       
-        # Generate a custom diverging colormap
-        cmap = sns.diverging_palette(145, 300, s=60, as_cmap=True)
-        # Draw the heatmap with the mask and correct aspect ratio
-        sns.heatmap(corr, mask=mask[0:30,0:30], cmap=cmap, vmax=1, center=0, vmin=-1,  
-                    square=True, linewidths=1, cbar_kws={"shrink": 1}, annot = True)      # cbar_kws={"shrink": 1} es el tamaño de la barra de color
-        st.pyplot()
+        # The ranks, the matrix and the heatmap are computed once per dataset version and neighbourhood (see airbnb/correlation.py)
+        neighbourhood = st.selectbox('Neighbourhood:', ['All'] + list(rollup(aggs, 'neighbourhood_cleansed').index))
+        corr, heatmap = load_correlation(None if neighbourhood == 'All' else neighbourhood, version)
+        st.image(heatmap)
         
         st.write('Some of the conclusions that can be drawn from the correlation graph are as follows:')
         st.markdown("""
@@ -399,6 +514,7 @@ elif page == "Other information":
 
 # PAGE 4-------------------------------------
 elif page == "Power BI dashboard":
+        metrics.section("Power BI dashboard")
         st.write('---------')
         st.markdown(
             '<div style="text-align: justify;">'
@@ -417,42 +533,97 @@ elif page == "Power BI dashboard":
 
 # PAGE 5-------------------------------------
 elif page == "Reviews":
+        metrics.section("Reviews/word cloud")
         st.markdown('A **word cloud** has been created from the accommodation reviews to show you the most common words based on their size:')   
       
 
-        wordcloud = "img/nube_airbnb.png"
-
-        st.image(wordcloud,width=500, use_column_width=True)
+        # word cloud of all the reviews, from the latest word-frequency index (see airbnb/wordfreq.py).
+        # If the reviews have not been indexed yet, the image generated in 2_NLP.ipynb is shown.
+        indexed = wordfreq.snapshots()
+        if indexed:
+            city, snapshot = indexed[-1]
+            index_version = wordfreq.index_version(city, snapshot)
+            _, neighbourhoods = load_word_index(city, snapshot, index_version)
+            neighbourhood = st.selectbox('Neighbourhood:', ['All'] + sorted(neighbourhoods))
+            wordcloud = load_word_cloud(city, snapshot, None if neighbourhood == 'All' else neighbourhood, index_version)
+            if wordcloud is None:
+                st.info('There are no reviews of this neighbourhood yet.')
+            else:
+                st.image(wordcloud, width=500)
+        else:
+            show_image("img/nube_airbnb.png", 704)
         st.write('-------------')
+        metrics.section("Reviews/sentiment")
         
         st.markdown('A **sentiment analysis** of the reviews has also been carried out. You can see a visualisation of the distribution of sentiment between positive, negative or neutral:')
-        # Open html files
-        SentFile = open("html/sentimentalanalysis.html", 'r', encoding='utf-8')
-        # Read and load into source_code variable
-        source_code = SentFile.read() 
-        print(source_code)
-        # view content on streamlit
-        components.html(source_code, height = 600)
+        sentiment_tables = load_sentiment_tables(sentiment.tables_version())
+        if sentiment_tables is None:
+            # html file with the sentiment analysis figure of 2_NLP.ipynb (read once per process)
+            with metrics.span("read_html"):
+                source_code = read_html("html/sentimentalanalysis.html")
+            # view content on streamlit
+            components.html(source_code, height = 600)
+        else:
+            # charts of all the reviews, drawn from the precomputed sentiment tables
+            import plotly.graph_objs as go
+            import plotly_express as px
+
+            summary = sentiment_tables['summary']
+            col1, col2 = st.columns(2)
+            with col1:
+                neighbourhoods = st.multiselect('Neighbourhoods:', sorted(summary['neighbourhood_cleansed'].unique()))
+            with col2:
+                room_types = st.multiselect('Room types:', sorted(summary['room_type'].unique()))
+            first, last = summary['month'].min().to_pydatetime(), summary['month'].max().to_pydatetime()
+            # st.slider needs two different values: no slider if all the reviews are from the same month
+            if first < last:
+                start, end = st.slider('Reviews from:', min_value=first, max_value=last, value=(first, last), format="MM/YYYY")
+            else:
+                start, end = first, last
+            selection = sentiment.filter_table(summary, neighbourhoods, room_types, start, end)
+
+            if selection.empty:
+                st.info('There are no reviews for this selection.')
+            else:
+                st.metric('Reviews', f"{selection['count'].sum():,}")
+                # Sentiment distribution (sum of each score, as in the notebook)
+                categories = ['Positive', 'Neutral', 'Negative']
+                counts = [selection['pos_sum'].sum(), selection['neu_sum'].sum(), selection['neg_sum'].sum()]
+                fig = go.Figure(data=[go.Bar(x=categories, y=counts, marker=dict(color=['#68D862', '#62D8D4', '#E65854']))])
+                fig.update_layout(title='Sentiment Distribution of reviews', title_x=0.3, xaxis_title='Sentiment', yaxis_title='Count')
+                st.plotly_chart(fig)
+
+                # Polarity distribution
+                histogram = sentiment.compound_histogram(
+                    sentiment.filter_table(sentiment_tables['histogram'], neighbourhoods, room_types, start, end))
+                fig = go.Figure(data=[go.Bar(x=histogram['compound'], y=histogram['count'])])
+                fig.update_layout(title='Reviews polarity distribution', title_x=0.3, xaxis_title='compound', yaxis_title='count', bargap=0)
+                st.plotly_chart(fig)
+
+                tab1, tab2 = st.tabs(["By neighbourhood", "By month"])
+                with tab1:
+                    by_neigh = sentiment.summarize(selection, 'neighbourhood_cleansed').sort_values('compound')
+                    fig = px.bar(by_neigh, x='compound', y='neighbourhood_cleansed', color='compound', color_continuous_scale='RdYlGn',
+                                 hover_data=['count'])
+                    fig.update_layout(height=500, title_text="Mean polarity of the reviews by neighbourhood", title_x=0.2,
+                                      xaxis_title='Mean compound', yaxis_title='', coloraxis_colorbar_title='Compound')
+                    st.plotly_chart(fig)
+                with tab2:
+                    by_month = sentiment.summarize(selection, 'month')
+                    fig = px.line(by_month, x='month', y='compound', hover_data=['count'])
+                    fig.update_layout(title_text="Mean polarity of the reviews by month", title_x=0.3, xaxis_title='', yaxis_title='Mean compound')
+                    st.plotly_chart(fig)
 # PAGE 6-------------------------------------
 elif page == "Price predictor":
+    metrics.section("Price predictor/form")
+    # the form is drawn while the predictor loads (once per process)
+    registry.warm_up_in_background()
     st.markdown("""
         <div style='text-align: center;'>
             <h1>Price prediction for Airbnb accommodation in Rome</h1>
         </div>
     """, unsafe_allow_html=True)
     
-    ## -- File upload 
-    scaler = load('outputs/scaler.pkl')
-    model = load_model('models/price_xbg') #load the model trained with xbg
-    # Open JSON file in read mode
-    with open("outputs/mapeo.json", "r") as json_file:
-        # Loads the content of the JSON file into a dictionary
-        encoder = json.load(json_file)
-        
-    with open("outputs/mapeo_inverso.json", "r") as json_file:    
-        decoder = json.load(json_file)
-
-
     municipi_options = [
     'I Centro Storico',
     'II Parioli/Nomentano',
@@ -464,10 +635,10 @@ elif page == "Price predictor":
     'VIII Appia Antica',
     'IX Eur',
     'X Ostia/Acilia',
-    'XI Arvalia/Portuense'
+    'XI Arvalia/Portuense',
     'XII Monte Verde',
     'XIII Aurelia',
-    'XIV Monte Mario'
+    'XIV Monte Mario',
     'XV Cassia/Flaminia',
     ]
 
@@ -481,19 +652,49 @@ elif page == "Price predictor":
         submit_button = st.form_submit_button(label='Predict the price')
 
     if submit_button:
-        input_data = pd.DataFrame([[beds, accom, bath, barrio]],
-                                columns=['beds', 'accommodates', 'bathrooms', 'neighbourhood_cleansed']) 
-
-    # 1- Encode what the user types into numbers using the mapping json.
-        input_data['neighbourhood_cleansed'] = input_data['neighbourhood_cleansed'].replace(encoder)
-        
-    # 2 - Normalise the input data
-        input_data_scaled = scaler.transform(input_data)
-        dtest = xgb.DMatrix(input_data_scaled) # convert the input data into a DMatrix object, the format used by XGBoost to make predictions.
-
-    # 3 - Make the prediction with the trained model
-        prediction = model.predict(dtest)
-        
-        predicted_price = prediction[-1]  # Generally, the prediction is in the last column.
+        # encode, normalise and predict with the scaler, encoder and model shared by all sessions (see airbnb/models.py)
+        with metrics.span("predict"):
+            predicted_price = registry.predict(beds, accom, bath, barrio)
         st.write(f"### The predicted price of the accommodation is {predicted_price:.2f} €")
-
+        cache_stats = registry.cache.stats()
+        st.caption(f"Prediction cache: {cache_stats['hit_rate']:.0%} of {cache_stats['hits'] + cache_stats['misses']:,} predictions answered without the model")
+
+    # --------------Batch prediction
+    metrics.section("Price predictor/batch")
+    st.write('-----')
+    st.markdown('### Price a whole portfolio')
+    st.markdown('Upload a CSV file with the columns ``beds``, ``accommodates``, ``bathrooms`` and ``neighbourhood_cleansed`` (one of the districts above):')
+    portfolio_file = st.file_uploader('Portfolio CSV', type='csv')
+
+    if portfolio_file is not None:
+        chunks = []
+        start = time.perf_counter()
+        try:
+            # an empty or malformed file raises EmptyDataError / ParserError (both ValueError)
+            portfolio = pd.read_csv(portfolio_file)
+            progress = st.progress(0.0)
+            # the predictions are streamed back batch by batch
+            for chunk in registry.iter_predict_batch(portfolio):
+                chunks.append(chunk)
+                progress.progress(sum(len(c) for c in chunks) / len(portfolio))
+        except ValueError as error:
+            st.error(f"The file could not be priced: {error}")
+        else:
+            elapsed = time.perf_counter() - start
+            predictions = pd.concat(chunks) if chunks else portfolio.assign(predicted_price=[])
+            st.metric('Throughput', f"{len(predictions) / elapsed:,.0f} rows/s" if elapsed else '-')
+            st.dataframe(predictions.head(100))
+            st.download_button('Download the predictions', predictions.to_csv(index=False), file_name='predicted_prices.csv', mime='text/csv')
+
+# ---------------------DEBUG----------------------#
+# end of the rerun: add ?debug=1 to the URL to see where it spent its time
+rerun_trace = metrics.end_rerun()
+if st.query_params.get('debug') == '1' and rerun_trace is not None:
+    with st.expander('Debug: timings of this rerun', expanded=True):
+        memory = rerun_trace['memory']
+        rss = f"{memory['rss'] / 1e6:,.0f} MB" if memory['rss'] else '-'
+        st.write(f"**{rerun_trace['page']}**: {rerun_trace['seconds'] * 1e3:,.1f} ms, process memory {rss}")
+        spans = pd.DataFrame(rerun_trace['spans'], columns=['name', 'seconds'])
+        st.dataframe(spans.assign(ms=spans['seconds'] * 1e3).drop(columns='seconds'))
+        if rerun_trace['caches']:
+            st.dataframe(pd.DataFrame(rerun_trace['caches']).T)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the app and the data pipeline. Run them from the repository root, e.g.:
+
+    python -m benchmarks.bench_store
+"""
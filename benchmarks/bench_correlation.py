@@ -0,0 +1,37 @@
+"""
+Spearman matrix of the "Other information" page: ``df.corr(method='spearman')`` vs the cached ranks of
+airbnb/correlation.py, for all the listings and for one neighbourhood. The matrices are checked to be equal.
+
+    python -m benchmarks.bench_correlation [--rows 300000]
+"""
+import argparse
+
+import numpy as np
+
+from airbnb.correlation import CORR_COLUMNS, build_ranks, spearman
+from airbnb.store import cast_listings
+from benchmarks.bench_store import timeit
+from benchmarks.synthetic import make_listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    df = cast_listings(make_listings(args.rows))
+    rows = (df['neighbourhood_cleansed'] == 'IX Eur').to_numpy()
+
+    ranks_time, ranks = timeit(lambda: build_ranks(df), args.repeat)
+    print(f"rank transform (once per dataset version): {ranks_time * 1e3:.1f} ms")
+    print(f"{'selection':<16}{'pandas (ms)':>14}{'cached ranks (ms)':>20}{'speed-up':>10}")
+    for name, selection in (('all', None), ('IX Eur', rows)):
+        subset = df if selection is None else df[selection]
+        pandas_time, expected = timeit(lambda: subset[CORR_COLUMNS].corr(method='spearman'), args.repeat)
+        ranks_time, result = timeit(lambda: spearman(ranks, selection), args.repeat)
+        assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
+        print(f"{name:<16}{pandas_time * 1e3:>14.1f}{ranks_time * 1e3:>20.1f}{pandas_time / ranks_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
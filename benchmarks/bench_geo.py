@@ -0,0 +1,80 @@
+"""
+Neighbourhood boundaries: WKT CSV vs GeoParquet load time, GeoJSON size per zoom,
+and points per second of the spatial join (STRtree + prepared polygons) vs testing each point against each polygon.
+
+    python -m benchmarks.bench_geo [--points 1000000] [--loop-points 2000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from airbnb.geo import CSV_PATH, NeighbourhoodIndex, build_boundaries, read_boundaries, to_geojson
+from benchmarks.bench_store import timeit
+
+
+def locate_loop(boundaries, lat, lon):
+    """
+    Point by point, polygon by polygon.
+    """
+    located = []
+    for y, x in zip(lat, lon):
+        point = shapely.Point(x, y)
+        name = None
+        for neighbourhood, geometry in zip(boundaries['neighbourhood'], boundaries['geometry']):
+            if geometry.contains(point):
+                name = neighbourhood
+                break
+        located.append(name)
+    return located
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--loop-points', type=int, default=2_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'neighbourhoods.parquet')
+        simplified_path = os.path.join(tmp, 'neighbourhoods_simplified.parquet')
+        build_boundaries(CSV_PATH, path, simplified_path)
+        csv_time, _ = timeit(lambda: read_boundaries(path='missing.parquet'), args.repeat)
+        parquet_time, boundaries = timeit(lambda: read_boundaries(path=path, simplified_path=simplified_path), args.repeat)
+        print(f"load: WKT csv {csv_time * 1e3:.1f} ms, GeoParquet {parquet_time * 1e3:.1f} ms "
+              f"({os.path.getsize(CSV_PATH) / 1e3:.0f} kB -> {os.path.getsize(path) / 1e3:.0f} kB, "
+              f"simplified copies {os.path.getsize(simplified_path) / 1e3:.0f} kB)")
+        for zoom in (None, 10, 12, 14):
+            csv_time, _ = timeit(lambda: read_boundaries(zoom, path='missing.parquet'), args.repeat)
+            parquet_time, zoomed = timeit(lambda: read_boundaries(zoom, path=path, simplified_path=simplified_path), args.repeat)
+            size = len(json.dumps(to_geojson(zoomed, ['neighbourhood'])))
+            print(f"zoom {zoom or 'full'}: load WKT csv {csv_time * 1e3:.1f} ms, GeoParquet {parquet_time * 1e3:.1f} ms, "
+                  f"GeoJSON {size / 1e3:.0f} kB")
+
+    rng = np.random.default_rng(357)
+    lat = rng.normal(41.89, 0.08, args.points)
+    lon = rng.normal(12.49, 0.12, args.points)
+    index = NeighbourhoodIndex.from_boundaries(boundaries)
+
+    start = time.perf_counter()
+    located = index.locate(lat, lon)
+    join = args.points / (time.perf_counter() - start)
+
+    sample = args.loop_points
+    start = time.perf_counter()
+    expected = locate_loop(boundaries, lat[:sample], lon[:sample])
+    loop = sample / (time.perf_counter() - start)
+    got = pd.Series(located[:sample]).astype(object)
+    assert got.where(got.notna(), None).tolist() == expected
+
+    print(f"join: loop {loop:,.0f} points/s, STRtree {join:,.0f} points/s ({join / loop:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
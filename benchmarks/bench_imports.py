@@ -0,0 +1,64 @@
+"""
+Import time and memory of the app start-up, before and after the lazy imports.
+
+Each scenario is imported in a fresh interpreter, so the numbers are those of a cold worker.
+
+    python -m benchmarks.bench_imports [--repeat 3]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    # what app_airbnb.py imported at module top before
+    'eager (all pages + pycaret)': ['streamlit', 'seaborn', 'matplotlib.pyplot', 'plotly_express', 'plotly.subplots',
+                                    'folium', 'streamlit_folium', 'xgboost', 'joblib', 'pycaret.regression'],
+    # what the Home page imports now (the module top of app_airbnb.py)
+    'lazy (Home page)': ['streamlit', 'airbnb.store', 'airbnb.aggregates', 'airbnb.tiles', 'airbnb.artifacts',
+                         'airbnb.assets', 'airbnb.correlation', 'airbnb.wordfreq', 'airbnb.sentiment', 'airbnb.metrics',
+                         'airbnb.models'],
+    # minimal predictor (numpy + xgboost), including loading the exported model
+    'native predictor': ['airbnb.predictor', 'xgboost'],
+}
+
+CHILD = """
+import importlib, resource, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+if 'airbnb.predictor' in sys.argv[1:]:
+    importlib.import_module('airbnb.predictor').load_predictor()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def run(modules):
+    """
+    Import ``modules`` in a new interpreter. Returns (seconds, peak RSS in MB), or None if a module is missing.
+    """
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', CHILD, *modules], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    seconds, rss = result.stdout.split()
+    return float(seconds), float(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<30}{'import (s)':>12}{'peak RSS (MB)':>16}")
+    for name, modules in SCENARIOS.items():
+        runs = [run(modules) for _ in range(args.repeat)]
+        if None in runs:
+            print(f"{name:<30}{'skipped (missing dependency)':>28}")
+            continue
+        seconds = statistics.median(r[0] for r in runs)
+        rss = statistics.median(r[1] for r in runs)
+        print(f"{name:<30}{seconds:>12.2f}{rss:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
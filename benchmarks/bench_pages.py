@@ -0,0 +1,347 @@
+"""
+Benchmark and load test of the pages of the app.
+
+Render: each page is run headlessly with Streamlit's AppTest, in its own process so that the first run is really
+cold (imports, caches, models). For each page: cold render time, warm (cached) render time, peak memory allocated
+while rendering with empty caches (tracemalloc) and payload size (protobuf of the elements sent to the browser;
+files such as images are downloaded separately and not counted).
+
+Load test: the app is started with ``streamlit run`` and several concurrent sessions connect to it through the
+websocket, like browsers, and go through all the pages. Reported: render latency per page (p50 / p95),
+renders per second and peak memory of the server.
+
+The results are compared with the baseline stored in benchmarks/baseline_pages.json; a metric that gets worse
+than the baseline by more than --tolerance is reported as a regression (``--check`` makes it an error).
+
+If outputs/airbnb_limpio.csv is missing, the app runs on synthetic listings (benchmarks/synthetic.py).
+
+    python -m benchmarks.bench_pages [--pages Home Reviews] [--sessions 8] [--rounds 3] [--save-baseline] [--check]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+import numpy as np
+
+from benchmarks.synthetic import make_listings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "app_airbnb.py"
+PAGES = ["Home", "Neighbourhoods", "Other information", "Power BI dashboard", "Reviews", "Price predictor"]
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_pages.json")
+SYNTHETIC_ROWS = 29_357
+# metrics compared with the baseline (lower is better)
+RENDER_METRICS = ['cold_s', 'warm_s', 'peak_mb', 'payload_kb']
+LOAD_METRICS = ['p50_s', 'p95_s']
+
+
+# ---------------------WORKSPACE----------------------#
+
+@contextlib.contextmanager
+def workspace(rows=SYNTHETIC_ROWS):
+    """
+    Temporary folder with links to the files of the repository, where the app can be run (and write its caches)
+    without touching the repository. Synthetic listings are used if the cleaned CSV is missing.
+    Yields (folder, True if the listings are synthetic).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in os.listdir(ROOT):
+            if name not in ('outputs', '.git'):
+                os.symlink(os.path.join(ROOT, name), os.path.join(tmp, name))
+        os.makedirs(os.path.join(tmp, 'outputs'))
+        for name in os.listdir(os.path.join(ROOT, 'outputs')):
+            os.symlink(os.path.join(ROOT, 'outputs', name), os.path.join(tmp, 'outputs', name))
+        synthetic = not os.path.exists(os.path.join(tmp, 'outputs', 'airbnb_limpio.csv'))
+        if synthetic:
+            make_listings(rows).to_csv(os.path.join(tmp, 'outputs', 'airbnb_limpio.csv'), index=False)
+        yield tmp, synthetic
+
+
+# ---------------------RENDER (APPTEST)----------------------#
+
+def _payload_bytes(node):
+    children = getattr(node, 'children', None)
+    if children is not None:
+        return sum(_payload_bytes(child) for child in children.values())
+    proto = getattr(node, 'proto', None)
+    return proto.ByteSize() if proto is not None and hasattr(proto, 'ByteSize') else 0
+
+
+def _select_page(page):
+    # option_menu is a custom component, which AppTest cannot click: make it return the page to render
+    import streamlit_option_menu
+    streamlit_option_menu.option_menu = lambda *args, **kwargs: page
+
+
+def measure_page(page, warm_runs=5, timeout=300):
+    """
+    Render ``page`` with AppTest (in the current working directory). Returns a dict with the metrics.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    _select_page(page)
+    at = AppTest.from_file(os.path.abspath(APP), default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    if at.exception:
+        return {'page': page, 'error': at.exception[0].message}
+    payload = _payload_bytes(at.main) + _payload_bytes(at.sidebar)
+
+    # the first run of the Price predictor page starts the warm-up of the predictor in a thread: let it finish,
+    # it would slow the warm runs down
+    for thread in threading.enumerate():
+        if thread.name == 'model-warm-up':
+            thread.join()
+    warm = []
+    for _ in range(warm_runs):
+        start = time.perf_counter()
+        at.run()
+        warm.append(time.perf_counter() - start)
+
+    # memory of a render with empty caches (the modules are already imported)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    tracemalloc.start()
+    at.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'page': page, 'cold_s': cold, 'warm_s': float(np.median(warm)), 'peak_mb': peak / 1e6,
+            'payload_kb': payload / 1e3}
+
+
+def measure_pages(pages, cwd, warm_runs=5):
+    """
+    Measure each page in a new process (see measure_page()).
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    results = []
+    for page in pages:
+        command = [sys.executable, '-m', 'benchmarks.bench_pages', '--worker', page, '--warm-runs', str(warm_runs)]
+        output = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+        lines = [line for line in output.stdout.splitlines() if line.startswith('{')]
+        results.append(json.loads(lines[-1]) if lines else {'page': page, 'error': (output.stderr.strip().splitlines() or ['no output'])[-1]})
+    return results
+
+
+# ---------------------LOAD TEST----------------------#
+
+@contextlib.contextmanager
+def server(cwd, port):
+    """
+    ``streamlit run`` of the app in ``cwd``, until the end of the block.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    command = [sys.executable, '-m', 'streamlit', 'run', APP, '--server.headless', 'true', '--server.port', str(port),
+               '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false']
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(120):
+            try:
+                with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except OSError:
+                time.sleep(0.5)
+        else:
+            raise RuntimeError("the streamlit server did not start")
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def _render(ws, widgets=()):
+    """
+    Ask the server to run the script and wait until it finishes.
+    Returns (seconds, bytes received, option_menu component or None, exceptions shown in the page).
+    """
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    message = BackMsg()
+    message.rerun_script.query_string = ''
+    message.rerun_script.widget_states.widgets.extend(widgets)
+    start = time.perf_counter()
+    await ws.send(message.SerializeToString())
+    received = 0
+    menu = None
+    exceptions = []
+    while True:
+        data = await ws.recv()
+        received += len(data)
+        forward = ForwardMsg()
+        forward.ParseFromString(data)
+        kind = forward.WhichOneof('type')
+        if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+            element = forward.delta.new_element
+            if element.WhichOneof('type') == 'component_instance' and element.component_instance.component_name.endswith('option_menu'):
+                menu = element.component_instance
+            if element.WhichOneof('type') == 'exception':
+                exceptions.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind == 'script_finished':
+            return time.perf_counter() - start, received, menu, exceptions
+
+
+async def _session(port, pages, rounds, timings):
+    import websockets
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    async with websockets.connect(f"ws://localhost:{port}/_stcore/stream", subprotocols=['streamlit'], max_size=None) as ws:
+        seconds, received, menu, exceptions = await _render(ws)
+        timings.append((PAGES[0], seconds, received, exceptions))
+        if menu is None:
+            raise RuntimeError("option_menu was not found in the page: cannot switch pages")
+        for _ in range(rounds):
+            for page in pages:
+                # select the page in the menu, as the browser does when it is clicked
+                state = WidgetState(id=menu.id, json_value=json.dumps(page))
+                seconds, received, _, exceptions = await _render(ws, [state])
+                timings.append((page, seconds, received, exceptions))
+
+
+def load_test(cwd, pages, sessions=8, rounds=3, port=8765):
+    """
+    Run ``sessions`` concurrent sessions going ``rounds`` times through ``pages``. Returns per page metrics
+    and a summary (renders per second, peak memory of the server).
+    """
+    with server(cwd, port) as process:
+        timings = []
+        peak_rss = [0]
+        stop = asyncio.Event()
+
+        async def watch_memory():
+            try:
+                import psutil
+            except ImportError:
+                return
+            proc = psutil.Process(process.pid)
+            while not stop.is_set():
+                peak_rss[0] = max(peak_rss[0], proc.memory_info().rss)
+                await asyncio.sleep(0.2)
+
+        async def run():
+            watcher = asyncio.create_task(watch_memory())
+            await asyncio.gather(*[_session(port, pages, rounds, timings) for _ in range(sessions)])
+            stop.set()
+            await watcher
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+    results = []
+    for page in pages:
+        rows = [row for row in timings if row[0] == page]
+        seconds = np.array([row[1] for row in rows])
+        received = np.array([row[2] for row in rows])
+        result = {'page': page, 'renders': len(rows), 'p50_s': float(np.percentile(seconds, 50)),
+                  'p95_s': float(np.percentile(seconds, 95)), 'kb_per_render': float(received.mean() / 1e3)}
+        failed = [row[3] for row in rows if row[3]]
+        if failed:
+            result['error'] = f"{len(failed)} of {len(rows)} renders showed an exception ({failed[0][0]})"
+        results.append(result)
+    summary = {'sessions': sessions, 'renders_per_s': len(timings) / elapsed,
+               'server_peak_mb': peak_rss[0] / 1e6 if peak_rss[0] else None}
+    return results, summary
+
+
+# ---------------------BASELINE----------------------#
+
+def compare(results, baseline, metrics, tolerance):
+    """
+    Print ``results`` next to the ``baseline`` (same pages). Returns the list of regressions
+    (a page that fails or does not report a metric is a regression too).
+    """
+    baseline = {row['page']: row for row in baseline}
+    regressions = []
+    print(f"{'page':<20}" + ''.join(f"{metric:>22}" for metric in metrics))
+    for row in results:
+        cells = []
+        for metric in metrics:
+            value, reference = row.get(metric), baseline.get(row['page'], {}).get(metric)
+            if value is None:
+                cells.append(f"{'error':>22}")
+                regressions.append(f"{row['page']} {metric}: {row.get('error', 'missing')}")
+                continue
+            text = f"{value:.3f}"
+            if reference:
+                change = value / reference - 1
+                text += f" ({change:+.0%})"
+                if change > tolerance:
+                    regressions.append(f"{row['page']} {metric}: {reference:.3f} -> {value:.3f}")
+            cells.append(f"{text:>22}")
+        print(f"{row['page']:<20}" + ''.join(cells))
+        if 'error' in row:
+            print(f"    error: {row['error']}")
+            if all(row.get(metric) is not None for metric in metrics):
+                regressions.append(f"{row['page']}: {row['error']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', nargs='+', default=PAGES, choices=PAGES)
+    parser.add_argument('--warm-runs', type=int, default=5)
+    parser.add_argument('--sessions', type=int, default=8, help='concurrent sessions of the load test (0 = no load test)')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative change that counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help=f'store the results in {os.path.relpath(BASELINE_PATH, ROOT)}')
+    parser.add_argument('--check', action='store_true', help='exit with an error if there are regressions')
+    parser.add_argument('--worker', choices=PAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure_page(args.worker, args.warm_runs)))
+        return
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r') as json_file:
+            baseline = json.load(json_file)
+
+    with workspace() as (cwd, synthetic):
+        print("Render (AppTest)")
+        render = measure_pages(args.pages, cwd, args.warm_runs)
+        regressions = compare(render, baseline.get('render', []), RENDER_METRICS, args.tolerance)
+
+        load, summary = [], {}
+        if args.sessions:
+            print(f"\nLoad test ({args.sessions} sessions x {args.rounds} rounds)")
+            load, summary = load_test(cwd, args.pages, args.sessions, args.rounds, args.port)
+            regressions += compare(load, baseline.get('load', []), LOAD_METRICS, args.tolerance)
+            server_peak = f"{summary['server_peak_mb']:.0f} MB" if summary['server_peak_mb'] else 'n/a (needs psutil)'
+            print(f"{summary['renders_per_s']:.1f} renders/s, server peak memory {server_peak}")
+
+    if regressions:
+        print("\nRegressions:\n" + '\n'.join(f"  - {regression}" for regression in regressions))
+
+    if args.save_baseline:
+        import streamlit
+
+        with open(BASELINE_PATH, 'w') as json_file:
+            json.dump({'machine': {'python': platform.python_version(), 'streamlit': streamlit.__version__,
+                                   'platform': platform.platform(), 'cpus': os.cpu_count()},
+                       'listings': 'synthetic' if synthetic else 'outputs/airbnb_limpio.csv',
+                       'render': render, 'load': load, 'load_summary': summary}, json_file, indent=2)
+        print(f"\nBaseline written to {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
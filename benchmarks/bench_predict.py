@@ -0,0 +1,70 @@
+"""
+Price predictor throughput (rows per second): one row at a time through the model, one row at a time through the
+registry (answered from the prediction cache when possible; its hit rate is reported) and batch prediction.
+
+    python -m benchmarks.bench_predict [--rows 100000] [--chunk-size 50000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from airbnb.models import CHUNK_SIZE, FEATURES, registry
+
+
+def make_portfolio(n, neighbourhoods, seed=357):
+    """
+    Random accommodations to price.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'beds': rng.integers(1, 8, n),
+        'accommodates': rng.integers(1, 17, n),
+        'bathrooms': rng.integers(1, 4, n),
+        'neighbourhood_cleansed': rng.choice(neighbourhoods, n),
+    }, columns=FEATURES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--single-rows', type=int, default=500, help='rows priced one by one')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    registry.warm_up()
+    print(f"warm-up: {time.perf_counter() - start:.2f} s")
+
+    portfolio = make_portfolio(args.rows, list(registry.encoder))
+
+    sample = portfolio.head(args.single_rows)
+    # inference only: the warm-up filled the prediction cache, which would answer most of these rows
+    predictor = registry.predictor
+    start = time.perf_counter()
+    for beds, accommodates, bathrooms, neighbourhood in sample.itertuples(index=False):
+        predictor.predict([beds, accommodates, bathrooms, predictor.encode([neighbourhood])[0]])
+    single = args.single_rows / (time.perf_counter() - start)
+
+    before = registry.cache.stats()
+    start = time.perf_counter()
+    for row in sample.itertuples(index=False):
+        registry.predict(*row)
+    cached = args.single_rows / (time.perf_counter() - start)
+    after = registry.cache.stats()
+    hits = after['hits'] - before['hits']
+    hit_rate = hits / (hits + after['misses'] - before['misses'])
+
+    start = time.perf_counter()
+    registry.predict_batch(portfolio, chunk_size=args.chunk_size)
+    batch = args.rows / (time.perf_counter() - start)
+
+    print(f"{'mode':<10}{'rows/s':>14}")
+    print(f"{'single':<10}{single:>14,.0f}")
+    print(f"{'cached':<10}{cached:>14,.0f}  ({hit_rate:.0%} cache hits)")
+    print(f"{'batch':<10}{batch:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
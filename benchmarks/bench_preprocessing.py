@@ -0,0 +1,77 @@
+"""
+Outlier repair: row loop of the notebooks vs the vectorised reparar_atipicos() of airbnb/preprocessing.py.
+
+The loop is only run up to --loop-max-rows (it takes minutes beyond that); where both run,
+the outputs are checked to be identical.
+
+    python -m benchmarks.bench_preprocessing [--sizes 30000 300000 3000000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from airbnb.preprocessing import reparar_atipicos
+from benchmarks.synthetic import make_listings
+
+NUMERIC_COLUMNS = ['price', 'host_listings_count', 'number_of_reviews', 'reviews_per_month', 'accommodates']
+
+
+def reparar_atipicos_loop(df, col):
+    """
+    Original implementation of the notebooks.
+    """
+    Q1 = col.quantile(0.25)
+    Q3 = col.quantile(0.75)
+    IQR = Q3 - Q1
+
+    atipico_inf = Q1 - (1.5 * IQR)
+    atipico_sup = Q3 + (1.5 * IQR)
+
+    for indice in range(len(df[col.name])):
+        if indice in df.index:
+            elemento = df.loc[indice, col.name]
+            if elemento > atipico_sup:
+                df.loc[indice, col.name] = atipico_sup
+            elif elemento < atipico_inf:
+                df.loc[indice, col.name] = atipico_inf
+
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30_000, 300_000, 3_000_000])
+    parser.add_argument('--loop-max-rows', type=int, default=300_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}{'loop (s)':>12}{'vectorised (s)':>16}{'speed-up':>10}")
+    for size in args.sizes:
+        base = make_listings(size)[['price']].astype('float64')
+
+        df = base.copy()
+        start = time.perf_counter()
+        reparar_atipicos(df, df['price'])
+        vectorised = time.perf_counter() - start
+
+        loop = None
+        if size <= args.loop_max_rows:
+            expected = base.copy()
+            start = time.perf_counter()
+            reparar_atipicos_loop(expected, expected['price'])
+            loop = time.perf_counter() - start
+            pd.testing.assert_frame_equal(df, expected)
+
+        loop_text = f"{loop:.2f}" if loop is not None else '-'
+        speed_up = f"{loop / vectorised:,.0f}x" if loop is not None else '-'
+        print(f"{size:>10}{loop_text:>12}{vectorised:>16.4f}{speed_up:>10}")
+
+    # all the numeric columns at once, as requested for the full listings
+    df = make_listings(args.sizes[-1])[NUMERIC_COLUMNS]
+    start = time.perf_counter()
+    reparar_atipicos(df)
+    print(f"all numeric columns ({len(NUMERIC_COLUMNS)}) x {args.sizes[-1]} rows: {time.perf_counter() - start:.4f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Sentiment scoring throughput (reviews per second) by number of worker processes,
+compared with the row-wise ``apply`` of 2_NLP.ipynb.
+
+Needs the VADER lexicon: ``python -c "import nltk; nltk.download('vader_lexicon')"``.
+
+    python -m benchmarks.bench_sentiment [--reviews 100000] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from airbnb.sentiment import score_texts
+
+WORDS = ['great', 'place', 'clean', 'host', 'dirty', 'noisy', 'location', 'amazing', 'bad', 'the', 'apartment',
+         'was', 'very', 'not', 'nice', 'recommend', 'terrible', 'perfect', 'small', 'quiet']
+
+
+def make_reviews(n, seed=357):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(5, 60, n)
+    return [' '.join(rng.choice(WORDS, length)) for length in lengths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}))
+    args = parser.parse_args()
+    texts = make_reviews(args.reviews)
+
+    # notebook: apply(get_sentiment) + apply(extract_sentiment, axis=1)
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    analyzer = SentimentIntensityAnalyzer()
+    sample = pd.DataFrame({'comments': texts[:10_000]})
+    start = time.perf_counter()
+    sample['scores'] = sample['comments'].apply(analyzer.polarity_scores)
+    sample[['pos', 'neu', 'neg', 'compound']] = sample.apply(
+        lambda row: (row['scores']['pos'], row['scores']['neu'], row['scores']['neg'], row['scores']['compound']),
+        axis=1, result_type='expand')
+    notebook = len(sample) / (time.perf_counter() - start)
+
+    print(f"{'mode':<16}{'reviews/s':>12}{'speed-up':>10}")
+    print(f"{'notebook apply':<16}{notebook:>12,.0f}{'1.0x':>10}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        score_texts(texts, workers=workers)
+        rate = len(texts) / (time.perf_counter() - start)
+        print(f"{f'{workers} worker(s)':<16}{rate:>12,.0f}{rate / notebook:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+CSV vs columnar listings store: load time and dataframe memory.
+
+Uses outputs/airbnb_limpio.csv if it exists, otherwise synthetic listings.
+
+    python -m benchmarks.bench_store [--rows 29357] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from airbnb.store import CSV_PATH, build_store, read_listings
+from benchmarks.synthetic import make_listings
+
+# columns read by the "Neighbourhoods" page
+PAGE_COLUMNS = ['latitude', 'longitude', 'neighbourhood_cleansed', 'price', 'review_scores_rating', 'review_scores_location']
+
+
+def timeit(func, repeat):
+    """
+    Best wall time of ``repeat`` calls, and the last result.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=29357, help='synthetic rows when the real CSV is missing')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = CSV_PATH
+        if not os.path.exists(csv_path):
+            csv_path = os.path.join(tmp, 'airbnb_limpio.csv')
+            make_listings(args.rows).to_csv(csv_path, index=False)
+        store_path = build_store(csv_path, os.path.join(tmp, 'airbnb_limpio.parquet'))
+
+        cases = {
+            'csv (pd.read_csv)': lambda: pd.read_csv(csv_path),
+            'store, all columns': lambda: read_listings(store_path=store_path),
+            'store, page columns': lambda: read_listings(PAGE_COLUMNS, store_path=store_path),
+        }
+        print(f"file sizes: csv {os.path.getsize(csv_path) / 1e6:.2f} MB | "
+              f"parquet {os.path.getsize(store_path) / 1e6:.2f} MB")
+        print(f"{'case':<22}{'load (ms)':>12}{'memory (MB)':>14}")
+        for name, func in cases.items():
+            seconds, df = timeit(func, args.repeat)
+            memory = df.memory_usage(deep=True).sum() / 1e6
+            print(f"{name:<22}{seconds * 1e3:>12.1f}{memory:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Review preprocessing: ``preprocess_text`` of 2_NLP.ipynb vs airbnb/text.py, in texts per second.
+The outputs are checked to be identical.
+
+Needs the NLTK data: ``python -c "import nltk; [nltk.download(p) for p in ('punkt_tab', 'stopwords', 'wordnet')]"``.
+
+    python -m benchmarks.bench_text [--reviews 100000] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import time
+
+from airbnb.text import iter_preprocess
+from benchmarks.bench_sentiment import make_reviews
+
+
+def preprocess_text_notebook(text):
+    """
+    Original implementation of 2_NLP.ipynb.
+    """
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+
+    tokens = word_tokenize(text.lower())
+    filtered_tokens = [token for token in tokens if token not in stopwords.words('english')]
+    lemmatizer = WordNetLemmatizer()
+    lemmatized_tokens = [lemmatizer.lemmatize(token) for token in filtered_tokens]
+    return ' '.join(lemmatized_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=100_000)
+    parser.add_argument('--notebook-reviews', type=int, default=5_000, help='the notebook function is slow: time it on fewer texts')
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}))
+    args = parser.parse_args()
+    texts = make_reviews(args.reviews)
+
+    sample = texts[:args.notebook_reviews]
+    start = time.perf_counter()
+    expected = [preprocess_text_notebook(text) for text in sample]
+    notebook = len(sample) / (time.perf_counter() - start)
+
+    print(f"{'mode':<16}{'texts/s':>12}{'speed-up':>10}")
+    print(f"{'notebook':<16}{notebook:>12,.0f}{'1.0x':>10}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        result = list(iter_preprocess(texts, workers))
+        rate = len(texts) / (time.perf_counter() - start)
+        assert result[:len(expected)] == expected
+        print(f"{f'{workers} worker(s)':<16}{rate:>12,.0f}{rate / notebook:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Synthetic data with the same columns as the cleaned listings (outputs/airbnb_limpio.csv),
+used by the benchmarks when the real files are not available.
+"""
+import numpy as np
+import pandas as pd
+
+NEIGHBOURHOODS = ['I Centro Storico', 'II Parioli/Nomentano', 'III Monte Sacro', 'IV Tiburtina',
+                  'V Prenestino/Centocelle', 'VI Roma delle Torri', 'VII San Giovanni/Cinecittà',
+                  'VIII Appia Antica', 'IX Eur', 'X Ostia/Acilia', 'XI Arvalia/Portuense',
+                  'XII Monte Verde', 'XIII Aurelia', 'XIV Monte Mario', 'XV Cassia/Flaminia']
+PROPERTY_TYPES = ['Entire rental unit', 'Private room in rental unit', 'Entire condo', 'Room in hotel',
+                  'Private room in bed and breakfast', 'Entire home', 'Entire loft', 'Shared room in hostel']
+ROOM_TYPES = ['Entire home/apt', 'Private room', 'Hotel room', 'Shared room']
+
+
+def make_listings(n, seed=357):
+    """
+    Create a dataframe of ``n`` fake listings around Rome.
+    """
+    rng = np.random.default_rng(seed)
+    # most listings are in the historic centre
+    weights = np.r_[10, np.ones(len(NEIGHBOURHOODS) - 1)]
+    # 5% of the listings belong to 20 professional hosts, the rest to hosts with one or a few listings
+    hosts = rng.integers(1_000, 500_000_000, max(n // 3, 40))
+    host = np.where(rng.random(n) < 0.05, rng.integers(0, 20, n), rng.integers(20, len(hosts), n))
+    # the superhost flag is a property of the host, and missing for ~1% of them (as in the real listings),
+    # including one of the professional hosts, so that the top 10 hosts chart gets a missing flag
+    superhost = rng.choice(['t', 'f'], len(hosts), p=[0.3, 0.7]).astype(object)
+    superhost[rng.random(len(hosts)) < 0.01] = None
+    superhost[2] = None
+    return pd.DataFrame({
+        'longitude': rng.normal(12.49, 0.06, n).round(6),
+        'latitude': rng.normal(41.89, 0.04, n).round(6),
+        'host_id': hosts[host],
+        'host_since': pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 5000, n), unit='D'),
+        'host_location': rng.choice(['Rome, Italy', 'Italy', 'Milan, Italy', 'London, United Kingdom'], n),
+        'host_response_rate': rng.uniform(0, 100, n).round(),
+        'host_acceptance_rate': rng.uniform(0, 100, n).round(),
+        'host_is_superhost': superhost[host],
+        'host_listings_count': rng.integers(1, 300, n),
+        'host_has_profile_pic': rng.choice(['t', 'f'], n, p=[0.98, 0.02]),
+        'neighbourhood_cleansed': rng.choice(NEIGHBOURHOODS, n, p=weights / weights.sum()),
+        'property_type': rng.choice(PROPERTY_TYPES, n),
+        'room_type': rng.choice(ROOM_TYPES, n, p=[0.7, 0.25, 0.04, 0.01]),
+        'accommodates': rng.integers(1, 17, n),
+        'bathrooms_text': rng.choice(['1 bath', '2 baths', '1 shared bath', '1.5 baths', 'Half-bath'], n),
+        'price': rng.lognormal(4.7, 0.5, n).round(2),
+        'availability_30': rng.integers(0, 31, n),
+        'availability_60': rng.integers(0, 61, n),
+        'availability_90': rng.integers(0, 91, n),
+        'number_of_reviews': rng.integers(0, 1000, n),
+        'review_scores_rating': rng.uniform(3, 5, n).round(2),
+        'review_scores_location': rng.uniform(3, 5, n).round(2),
+        'reviews_per_month': rng.uniform(0, 10, n).round(2),
+    })